@@ -0,0 +1,207 @@
+"""
+Background delivery of alerts, so a slow or hung mail server never delays a poll.
+
+The poll loop submits each cycle's alert lines to a bounded queue and continues. A
+dispatcher thread collects them into digests across services and cycles, sent at
+most once per interval to every sink. A line's condition key, e.g. (service, attr)
+of a deviation, is reported once per quiet period; repeats are counted, not sent.
+When the queue is full, new lines are dropped and counted rather than waiting.
+Sinks are objects with send(subject, body): LogErrSink, SmtpSink, FileSink and
+WebhookSink. smtpStub.py is a local SMTP server to test SmtpSink against.
+"""
+
+import json
+import queue
+import sys
+import threading
+from time import monotonic, strftime
+
+
+class LogErrSink:
+    """Deliver digests by the logErr module, as the poller did before dispatching
+
+    logErr mails to its module-global logToAddr, so each send sets it, under a lock
+    shared by every sink, for the sinks of several monitors in one process.
+
+    Parameters:
+        log_err:			the logErr module
+        recipients (list):	To addresses. None to keep logErr's own
+    """
+    lock = threading.Lock()
+
+    def __init__(self, log_err, recipients: list = None):
+        self.log_err = log_err
+        self.recipients = recipients
+
+    def send(self, subject: str, body: str):
+        with LogErrSink.lock:
+            self.log_err.logSubject = subject
+            if self.recipients is not None:
+                self.log_err.logToAddr = self.recipients
+            self.log_err(body)
+
+
+class SmtpSink:
+    """Email digests by SMTP
+
+    Parameters:
+        host (str):			SMTP server
+        port (int):			SMTP port
+        sender (str):		From address
+        recipients (list):	To addresses
+        timeout (float):	seconds to wait for the server
+    """
+
+    def __init__(self, host: str, port: int, sender: str, recipients: list,
+                 timeout: float = 30.0):
+        self.host = host
+        self.port = port
+        self.sender = sender
+        self.recipients = recipients
+        self.timeout = timeout
+
+    def send(self, subject: str, body: str):
+        from email.message import EmailMessage
+        import smtplib					# only when mailing, as it is slow to import
+        msg = EmailMessage()
+        msg['Subject'] = subject
+        msg['From'] = self.sender
+        msg['To'] = ', '.join(self.recipients)
+        msg.set_content(body)
+        with smtplib.SMTP(self.host, self.port, timeout=self.timeout) as smtp:
+            smtp.send_message(msg)
+
+
+class FileSink:
+    """Append digests to a file, each headed by its time and subject"""
+
+    def __init__(self, file_name: str):
+        self.file_name = file_name
+
+    def send(self, subject: str, body: str):
+        with open(self.file_name, 'a') as f:
+            f.write(f"--- {strftime('%c')} {subject}\n{body}\n")
+
+
+class WebhookSink:
+    """POST digests as JSON {"subject": subject, "text": body} to a URL"""
+
+    def __init__(self, url: str, timeout: float = 30.0):
+        self.url = url
+        self.timeout = timeout
+
+    def send(self, subject: str, body: str):
+        import requests
+        response = requests.post(self.url, data=json.dumps({'subject': subject, 'text': body}),
+                                 headers={'Content-Type': 'application/json'},
+                                 timeout=self.timeout)
+        response.raise_for_status()
+
+
+class Dispatcher:
+    """Queue of alert lines, delivered as digests by a background thread
+
+    Parameters:
+        sinks (list):		objects with send(subject, body)
+        subject (str):		subject of each digest
+        interval (float):	least seconds between digests
+        quiet (float):		seconds a condition is not reported again. 0 to report all
+        max_queue (int):	most lines waiting to be collected
+    """
+
+    def __init__(self, sinks: list, subject: str = 'Oarnet statistics', interval: float = 300.0,
+                 quiet: float = 3600.0, max_queue: int = 1000):
+        self.sinks = sinks
+        self.subject = subject
+        self.interval = interval
+        self.quiet = quiet
+        self.queue = queue.Queue(max_queue)
+        self.dropped = 0				# lines dropped because the queue was full
+        self.suppressed = 0				# repeats not reported, since the last digest
+        self.reported = {}				# {condition key: when last reported}
+        self.pending = []				# lines of the next digest
+        self.sent = None				# when the last digest was sent
+        self.digests = 0				# digests sent
+        self.lock = threading.Lock()	# of dropped
+        self.thread = threading.Thread(target=self.run, name='alertDispatch', daemon=True)
+        self.thread.start()
+
+    def submit(self, lines: list):
+        """Queue alert lines without waiting
+
+        Parameters:
+            lines (list):	[(condition key, text), ...]. The key of a line without a
+                            condition to deduplicate may be its text
+        """
+        for line in lines:
+            try:
+                self.queue.put_nowait(line)
+            except queue.Full:
+                with self.lock:
+                    self.dropped += 1
+
+    def close(self, timeout: float = None):
+        """Send the pending lines now, and stop the thread"""
+        self.queue.put(None)
+        self.thread.join(timeout)
+
+    def run(self):
+        """Collect queued lines, and send digests when due, until close()"""
+        while True:
+            wait = None
+            if self.pending or self.suppressed:  # time until the next digest is due
+                wait = max(0.0, self.interval - (monotonic() - self.sent)) \
+                    if self.sent is not None else 0.0
+            try:
+                line = self.queue.get(timeout=wait)
+            except queue.Empty:
+                self.flush()
+                continue
+            if line is None:			# closed?
+                self.flush()
+                return
+            self.collect(*line)
+            while True:					# and any others already waiting
+                try:
+                    line = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                if line is None:
+                    self.flush()
+                    return
+                self.collect(*line)
+            if self.sent is None or monotonic() - self.sent >= self.interval:
+                self.flush()
+
+    def collect(self, key, text: str):
+        """Add text to the next digest, unless its condition was reported recently"""
+        now = monotonic()
+        last = self.reported.get(key)
+        if last is not None and now - last < self.quiet:
+            self.suppressed += 1
+            return
+        self.reported[key] = now
+        self.pending.append(text)
+        if len(self.reported) > 10000:	# forget conditions no longer quiet
+            self.reported = {k: t for k, t in self.reported.items() if now - t < self.quiet}
+
+    def flush(self):
+        """Send the pending lines as one digest to every sink"""
+        with self.lock:
+            dropped, self.dropped = self.dropped, 0
+        if not self.pending and not dropped and not self.suppressed:
+            return
+        lines, self.pending = self.pending, []
+        if self.suppressed:
+            lines.append(f"({self.suppressed} repeated alerts suppressed)")
+        if dropped:
+            lines.append(f"({dropped} alerts dropped, the alert queue was full)")
+        self.suppressed = 0
+        body = '\n'.join(lines) + '\n'
+        for sink in self.sinks:
+            try:
+                sink.send(self.subject, body)
+            except Exception as e:		# one sink failing must not stop the others
+                print(f"alert sink {type(sink).__name__} failed: {e}", file=sys.stderr)
+        self.sent = monotonic()
+        self.digests += 1
@@ -0,0 +1,206 @@
+"""
+Throughput and latency of each stage of a poll cycle, against the local gateway stand-in.
+
+Stages, each timed over --repeat runs of one service's window of samples:
+    fetch	GET of the window from gatewayStub, through a keep-alive session
+    parse	JSON body to {x: [y1, ..., yn]}, both timed within Monitor.oarNet_stats
+    trim	sort and drop the records at or before the previous maximum date
+    detect	Monitor.statChange of both traffic columns, after a week of learning
+    write	date formatting and a HistWriter append and commit
+    poll	Monitor.poll of one new record, as a resident process runs each --job
+    startup	oarnetGeist.py --refresh 0 --deviations, for each --weeks of history
+Results print as a table, and are saved to and compared with a JSON file of results:
+    python benchmark.py --save before.json
+    python benchmark.py --compare before.json --tolerance 0.2
+The comparison exits with status 1 when a stage is slower by more than the tolerance.
+oarnetGeist.Monitor needs the cred module. startup runs cold processes; skip it by --weeks 0.
+"""
+
+import bisect
+from contextlib import redirect_stdout
+import csv
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from argparse import ArgumentParser
+from operator import itemgetter
+from statistics import median
+from time import perf_counter, time
+
+from pytz import timezone
+
+import deviation
+import gatewayStub
+import histWriter
+import oarnetGeist
+import tsCodec
+from columns import epoch, csvHeaders
+
+script = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'oarnetGeist.py')
+
+
+def timed(stage: dict, records: int, fn):
+    """Run fn() and add its time to stage. Return its result"""
+    begin = perf_counter()
+    result = fn()
+    record(stage, perf_counter() - begin, records)
+    return result
+
+
+def record(stage: dict, seconds: float, records: int):
+    """Add one run of seconds over records to stage"""
+    stage.setdefault('seconds', []).append(seconds)
+    stage['records'] = records
+
+
+def trim(report: dict, prev_max: float) -> list:
+    """Sorted records of report newer than prev_max"""
+    recs = sorted([x] + report[x] for x in report)
+    return recs[bisect.bisect_right(recs, prev_max, key=itemgetter(epoch)):]
+
+
+def detect(monitor: oarnetGeist.Monitor, service: str, recs: list) -> int:
+    """Number of alerts raised by recs"""
+    alerts = 0
+    for rec in recs:
+        for attr in oarnetGeist.attrs:
+            if monitor.statChange(service, rec, attr) is not None:
+                alerts += 1
+    return alerts
+
+
+def write(writer: histWriter.HistWriter, recs: list):
+    """Append recs to writer's file in one commit"""
+    for rec in recs:
+        writer.write([oarnetGeist.strftime(rec[epoch])] + rec[1:])
+    writer.commit()
+
+
+def write_history(gateway: gatewayStub.Gateway, pathname: str, service: str, weeks: int,
+                  end: float, codec: tsCodec.TimestampCodec):
+    """Write weeks of gateway's records of service, ending before end, to pathname"""
+    recs = list(gateway.records(service, end - weeks*7*86400, end, 300))
+    dates = codec.format_column(rec[epoch] for rec in recs)
+    with open(os.path.join(pathname, service) + '.csv', 'w', newline='') as f:
+        w = csv.writer(f)
+        w.writerow(csvHeaders)
+        w.writerows([date] + rec[1:] for date, rec in zip(dates, recs))
+
+
+def stages(url: str, gateway: gatewayStub.Gateway, args) -> dict:
+    """{stage: {"seconds": [each run], "records": per run}} of the per-cycle stages"""
+    results = {name: {} for name in ('fetch', 'parse', 'trim', 'detect', 'write', 'poll')}
+    service = args.service
+    learned = list(gateway.records(service, time() - 2*7*86400, time() - 7*86400, 300))
+    with tempfile.TemporaryDirectory() as scratch, redirect_stdout(io.StringIO()):
+        monitor = oarnetGeist.Monitor(oarnetGeist.parser.parse_args(
+            [scratch, '--refresh', '0', '--gateway', url, '--services', service,
+             '--deviations', str(args.deviations), '--time_frame', str(args.time_frame),
+             '--workers', '1']))
+        window = (monitor.args.devices, monitor.args.member, service, args.time_frame,
+                  300, 'avg')
+        for _ in range(args.repeat):
+            monitor.metrics.values.clear()
+            report, _ = monitor.oarNet_stats(*window)
+            seconds = monitor.metrics.values
+            record(results['fetch'], seconds[('http_seconds', service)], len(report))
+            record(results['parse'], seconds[('parse_seconds', service)], len(report))
+            results['fetch']['bytes'] = seconds[('http_bytes', service)]
+            prev_max = min(report) + (max(report) - min(report))/2  # half the window is new
+            recs = timed(results['trim'], len(report), lambda: trim(report, prev_max))
+            monitor.hist[service] = {attr: deviation.Baseline() for attr in oarnetGeist.attrs}
+            detect(monitor, service, learned)
+            results['detect']['alerts'] = timed(results['detect'], len(recs),
+                                                lambda: detect(monitor, service, recs))
+            timed(results['write'], len(recs),
+                  lambda: write(monitor.histWriters[service], recs))
+        monitor.prevMax[service] = 0.0
+        monitor.poll()					# the first poll of the whole window
+        for _ in range(args.repeat):	# then polls as by a resident --job
+            monitor.prevMax[service] -= 300  # one new record
+            timed(results['poll'], 1, monitor.poll)
+        monitor.close()
+    return results
+
+
+def startup(url: str, gateway: gatewayStub.Gateway, args) -> dict:
+    """{"startup N weeks": {"seconds": [each run], "records": history records}}"""
+    results = {}
+    codec = tsCodec.TimestampCodec(timezone('US/Eastern'))
+    for weeks in args.weeks:
+        name = f"startup {weeks} weeks"
+        results[name] = {'records': 0}
+        for _ in range(args.repeat):
+            with tempfile.TemporaryDirectory() as scratch:
+                for service in ('INTERNET', 'I2', 'ONNET'):
+                    write_history(gateway, scratch, service, weeks, time() - 86400, codec)
+                results[name]['records'] = 3*weeks*7*288
+                command = [sys.executable, script, scratch, '--refresh', '0', '--gateway',
+                           url, '--deviations', str(args.deviations)]
+                done = timed(results[name], results[name]['records'], lambda: subprocess.run(
+                    command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT))
+                if done.returncode != 0:
+                    raise RuntimeError(f"{' '.join(command)} failed:\n{done.stdout.decode()}")
+    return results
+
+
+def report(results: dict, baseline: dict = None, tolerance: float = 0.2) -> list:
+    """Print results, and return the names of stages slower than baseline by tolerance"""
+    slower = []
+    print(f"{'stage':20} {'median ms':>10} {'records/s':>12}  vs baseline")
+    for name, stage in results.items():
+        seconds = median(stage['seconds'])
+        rate = f"{stage['records']/seconds:12,.0f}" if stage['records'] and seconds else ''
+        change = ''
+        if baseline and name in baseline:
+            before = median(baseline[name]['seconds'])
+            change = f"{seconds/before - 1:+.0%}" if before else ''
+            if before and seconds > before*(1 + tolerance):
+                slower.append(name)
+                change += ' SLOWER'
+        print(f"{name:20} {1000*seconds:10.2f} {rate:>12}  {change}")
+    return slower
+
+
+if __name__ == '__main__':
+    parser = ArgumentParser(description='Time each stage of a poll cycle against a local gateway')
+    parser.add_argument('--pathname', default=None,
+                        help='directory of service.csv files for the gateway to serve. '
+                             'Default=generated traffic')
+    parser.add_argument('--service', default='INTERNET', choices=['INTERNET', 'I2', 'ONNET'])
+    parser.add_argument('--time_frame', type=int, default=10080,
+                        help='minutes of samples per request. Default=10080')
+    parser.add_argument('--scale', type=int, default=1,
+                        help='multiplier of the samples in each response. Default=1')
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help='seconds the gateway waits before each response. Default=0')
+    parser.add_argument('--deviations', type=float, default=10.0)
+    parser.add_argument('--repeat', type=int, default=5, help='runs of each stage. Default=5')
+    parser.add_argument('--weeks', type=int, action='append', default=None,
+                        help='weeks of history for a startup run. 0 for none. Default=1 4 13')
+    parser.add_argument('--save', help='write the results to this JSON file')
+    parser.add_argument('--compare', help='JSON file of earlier results to compare with')
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help='fraction slower than --compare that fails. Default=0.2')
+    args = parser.parse_args()
+    args.weeks = [w for w in (args.weeks or [1, 4, 13]) if w > 0]
+    gateway = gatewayStub.Gateway(args.pathname, args.scale, args.latency)
+    server = gatewayStub.serve(gateway)
+    url = gatewayStub.url(server)
+    results = stages(url, gateway, args)
+    results.update(startup(url, gateway, args))
+    server.shutdown()
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    slower = report(results, baseline, args.tolerance)
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(results, f, indent=1)
+    if slower:
+        print(f"Slower than {args.compare}: {', '.join(slower)}")
+        sys.exit(1)
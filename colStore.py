@@ -0,0 +1,206 @@
+"""
+Append-only columnar store of one service's statistics records.
+
+A store is a directory, pathname/service.col, holding one file per column:
+    Date.i8			int64 epoch seconds of each record
+    <column>.f8		float64 value of each record
+    <column>.rle	(row, value) runs of a column that seldom changes. The value of
+                    record i is that of the last run whose row <= i.
+Files hold native-endian binary arrays without headers, so each is mapped into
+a NumPy array without copying. Records are committed by appending to Date.i8
+last; values and runs of rows beyond Date.i8, left by an interrupted append, are
+truncated when the store is opened, unless it is opened read-only, e.g. by a query
+alongside the poller. A read-only store reads only the records committed when it
+was opened.
+"""
+
+import csv
+import os
+from typing import Callable, Iterator
+
+import numpy as np
+
+from columns import csvHeaders, Client2OarDrops, Oar2ClientDrops, Subscription, Burst, \
+    int_or_float
+
+EPOCH_TYPE = np.dtype('<i8')
+VALUE_TYPE = np.dtype('<f8')
+RUN_TYPE = np.dtype([('row', '<i8'), ('value', '<f8')])
+# columns that repeat the same value nearly every record
+RLE_COLUMNS = frozenset(csvHeaders[i] for i in
+                        (Client2OarDrops, Oar2ClientDrops, Subscription, Burst))
+
+
+def _map(file_name: str, dtype: np.dtype, count: int = None) -> np.ndarray:
+    """Read-only memory map of the first count elements of a binary array file"""
+    size = os.path.getsize(file_name)//dtype.itemsize
+    count = size if count is None else min(count, size)
+    if count == 0:					# mmap cannot map an empty file
+        return np.empty(0, dtype)
+    return np.memmap(file_name, dtype, 'r', shape=(count,))
+
+
+class ColumnStore:
+    """Columnar history of one service
+
+    Parameters:
+        path (str):			directory of the store. Created if it does not exist
+        headers (list):		column names, epoch first. Default=csvHeaders
+        rle (set):			names of the run length encoded columns
+        readonly (bool):	neither create nor repair the files. append() is not allowed
+    """
+
+    def __init__(self, path: str, headers: list = None, rle: frozenset = RLE_COLUMNS,
+                 readonly: bool = False):
+        self.path = path
+        self.headers = list(headers or csvHeaders)
+        self.rle = {name for name in self.headers[1:] if name in rle}
+        self.last_run = {}			# {name: value of the newest run}
+        self.readonly = readonly
+        if readonly:				# the records committed so far
+            self.rows = os.path.getsize(self._file(self.headers[0]))//EPOCH_TYPE.itemsize
+            return
+        os.makedirs(path, exist_ok=True)
+        self.rows = self._repair()
+        for name in self.rle:
+            runs = _map(self._file(name), RUN_TYPE)
+            self.last_run[name] = float(runs['value'][-1]) if len(runs) else None
+
+    def _file(self, name: str) -> str:
+        """File name of column name"""
+        if name == self.headers[0]:
+            suffix = '.i8'
+        elif name in self.rle:
+            suffix = '.rle'
+        else:
+            suffix = '.f8'
+        return os.path.join(self.path, name + suffix)
+
+    def _repair(self) -> int:
+        """Create missing column files, trim uncommitted values, return record count"""
+        for name in self.headers:
+            open(self._file(name), 'ab').close()
+        date_file = self._file(self.headers[0])
+        rows = os.path.getsize(date_file)//EPOCH_TYPE.itemsize
+        os.truncate(date_file, rows*EPOCH_TYPE.itemsize)  # partial last epoch
+        for name in self.headers[1:]:
+            file_name = self._file(name)
+            if name not in self.rle:
+                if os.path.getsize(file_name) > rows*VALUE_TYPE.itemsize:
+                    os.truncate(file_name, rows*VALUE_TYPE.itemsize)
+                continue
+            runs = _map(file_name, RUN_TYPE)	# whole runs only, of committed rows
+            keep = int(np.searchsorted(runs['row'], rows))
+            del runs
+            if os.path.getsize(file_name) > keep*RUN_TYPE.itemsize:
+                os.truncate(file_name, keep*RUN_TYPE.itemsize)
+        return rows
+
+    def __len__(self) -> int:
+        return self.rows
+
+    def append(self, recs: list):
+        """Append records [x, y1, ..., yn], in increasing x order, to the store"""
+        if self.readonly:
+            raise ValueError(f"{self.path} is open read-only")
+        if not recs:
+            return
+        table = np.array(recs, dtype=VALUE_TYPE).reshape(len(recs), len(self.headers))
+        for i, name in enumerate(self.headers[1:], 1):
+            column = table[:, i]
+            with open(self._file(name), 'ab') as f:
+                if name not in self.rle:
+                    f.write(column.tobytes())
+                    continue
+                # a run starts wherever the value differs from the previous one
+                prev = np.concatenate(([np.nan if self.last_run[name] is None
+                                        else self.last_run[name]], column[:-1]))
+                starts = np.flatnonzero(column != prev)
+                runs = np.empty(len(starts), RUN_TYPE)
+                runs['row'] = self.rows + starts
+                runs['value'] = column[starts]
+                f.write(runs.tobytes())
+                self.last_run[name] = float(column[-1])
+        with open(self._file(self.headers[0]), 'ab') as f:  # commit the records
+            f.write(table[:, 0].astype(EPOCH_TYPE).tobytes())
+        self.rows += len(recs)
+
+    def epochs(self) -> np.ndarray:
+        """Memory mapped int64 epoch seconds of every record"""
+        return _map(self._file(self.headers[0]), EPOCH_TYPE, self.rows)
+
+    def after(self, t: float) -> int:
+        """Row of the first record newer than t, or len(self) if there is none"""
+        return int(np.searchsorted(self.epochs(), t, side='right'))
+
+    def runs(self, name: str) -> np.ndarray:
+        """Memory mapped (row, value) runs of a run length encoded column"""
+        runs = _map(self._file(name), RUN_TYPE)
+        return runs[:np.searchsorted(runs['row'], self.rows)]  # committed rows only
+
+    def column(self, name: str, start: int = 0, stop: int = None) -> np.ndarray:
+        """Values of column name for records [start:stop]
+
+        Plain columns are memory mapped without copying. Run length encoded
+        columns are expanded into a new array.
+        """
+        stop = self.rows if stop is None else min(stop, self.rows)
+        if name not in self.rle:
+            return _map(self._file(name), VALUE_TYPE, self.rows)[start:stop]
+        runs = self.runs(name)
+        which = np.searchsorted(runs['row'], np.arange(start, stop), side='right') - 1
+        if len(which) and which[0] < 0:
+            raise ValueError(f"{self.path} {name} has no run for row {start}")
+        return runs['value'][which]
+
+    def records(self, start: int = 0, stop: int = None) -> Iterator[list]:
+        """Generate records [x, y1, ..., yn] [start:stop], integral values as int"""
+        stop = self.rows if stop is None else min(stop, self.rows)
+        columns = [self.epochs()[start:stop]] \
+            + [self.column(name, start, stop) for name in self.headers[1:]]
+        for row in zip(*(c.tolist() for c in columns)):
+            yield [float(row[0])] + [int(y) if y == int(y) else y for y in row[1:]]
+
+
+def import_csv(store: ColumnStore, csv_name: str, parse: Callable) -> int:
+    """Append the records of a csv file, newer than those in store, to store
+
+    Parameters:
+        store (ColumnStore):	destination
+        csv_name (str):			path of the csv file, with header record
+        parse (callable):		parse(date_str) --> epoch seconds
+    Returns:					number of records appended
+    """
+    epochs = store.epochs()
+    newest = epochs[-1] if len(epochs) else -np.inf
+    recs = []
+    with open(csv_name, 'r', newline='') as csv_file:
+        reader = csv.reader(csv_file)
+        next(reader, None)			# skip the header record
+        for rec in reader:
+            try:
+                rec = [parse(rec[0])] + [int_or_float(v) for v in rec[1:]]
+            except (IndexError, ValueError):
+                continue			# bad record ignored
+            if rec[0] > newest and len(rec) == len(store.headers):
+                newest = rec[0]
+                recs.append(rec)
+    store.append(recs)
+    return len(recs)
+
+
+def export_csv(store: ColumnStore, csv_name: str, format_: Callable,
+               start: int = 0, stop: int = None):
+    """Write the records of store [start:stop] to a new csv file
+
+    Parameters:
+        store (ColumnStore):	source
+        csv_name (str):			path of the csv file to create
+        format_ (callable):		format_(epoch seconds) --> date_str
+    """
+    with open(csv_name, 'w', newline='') as csv_file:
+        writer = csv.writer(csv_file)
+        writer.writerow(store.headers)
+        for rec in store.records(start, stop):
+            rec[0] = format_(rec[0])
+            writer.writerow(rec)
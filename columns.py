@@ -0,0 +1,23 @@
+"""
+Layout of an OARnet statistics record, as kept in memory and in pathname/service.csv
+"""
+
+# Column index of each series in a record
+epoch = 0					# time in epoch seconds
+Client2Oar = 1				# Client to OARnet
+Oar2Client = 2				# OARnet to Client
+Client2OarDrops = 3			# Client to OARnet drops
+Oar2ClientDrops = 4			# OARnet to Client drops
+Subscription = 5			# The line for the subscription
+Burst = 6					# The line for the burst
+csvHeaders = ["Date", "Client2Oar", "Oar2Client", "Client2OarDrops",
+            "Oar2ClientDrops", "Subscription", "Burst"]
+attrIndex = {csvHeaders[i]: i for i in range(len(csvHeaders))}  # map name to index
+
+
+def int_or_float(s: str):
+    """Converts string to int or float, with possible ValueError."""
+    x = float(s)  # convert string to float ...
+    if x == int(x):
+        x = int(x)  # ... or int iff no decimal
+    return x
@@ -0,0 +1,95 @@
+"""
+Random access to the time-ordered pathname/service.csv history files.
+
+Records are appended in increasing time order, so the newest record is the last
+complete line, and the first record after any time can be found by binary search
+over byte offsets. Neither needs more than a few reads, whatever the file size.
+"""
+
+import csv
+import os
+from typing import Callable, Union
+
+
+def record(line: bytes) -> list:
+    """Split one csv line into its list of field strings
+
+    Parameters:
+        line (bytes):		a line of the csv file, with or without line terminator
+    Returns:
+        [field, ...]
+    """
+    return next(csv.reader([line.decode().rstrip('\r\n')]), [])
+
+
+def last_record(f, parse: Callable, block: int = 4096) -> Union[tuple, None]:
+    """Find the last complete record of a csv file that parse accepts
+
+    A final line without its line terminator is a torn write, and is ignored.
+
+    Parameters:
+        f:					csv file opened in binary mode
+        parse (callable):	parse(rec) --> record time, or None to skip rec
+        block (int):		bytes read per step backward from the end of f
+    Returns:
+        (rec, x), or None if f has no acceptable record
+    """
+    f.seek(0, os.SEEK_END)
+    pos = f.tell()
+    buf = b''						# complete lines from pos to the last newline
+    complete = False				# have found the last newline?
+    while pos > 0:
+        step = min(block, pos)
+        pos -= step
+        f.seek(pos)
+        buf = f.read(step) + buf
+        if not complete:
+            nl = buf.rfind(b'\n')
+            if nl < 0:				# no complete line yet
+                continue
+            buf = buf[:nl+1]		# drop text after the last newline
+            complete = True
+        lines = buf.split(b'\n')
+        for line in reversed(lines[0 if pos == 0 else 1:-1]):
+            rec = record(line)
+            x = parse(rec)
+            if x is not None:
+                return rec, x
+        buf = lines[0] + b'\n'		# partial first line, completed by next block
+    return None
+
+
+def _line_start(f, p: int) -> int:
+    """Seek f to the first line that starts at or after offset p"""
+    if p == 0:
+        f.seek(0)
+    else:
+        f.seek(p - 1)
+        f.readline()				# skip the rest of the line containing p-1
+    return f.tell()
+
+
+def seek_after(f, t: float, parse: Callable) -> int:
+    """Seek to the first record with time > t in a time-ordered csv file
+
+    Records that parse rejects, such as the header, are treated as older than t.
+
+    Parameters:
+        f:					csv file opened in binary mode
+        t (float):			epoch seconds
+        parse (callable):	parse(rec) --> record time, or None if rec has none
+    Returns:
+        offset of that record, or of end-of-file if there is none
+    """
+    f.seek(0, os.SEEK_END)
+    lo, hi = 0, f.tell()
+    while lo < hi:					# smallest p whose next line is newer than t
+        mid = (lo + hi)//2
+        _line_start(f, mid)
+        line = f.readline()
+        x = parse(record(line)) if line else None
+        if not line or (x is not None and x > t):
+            hi = mid
+        else:
+            lo = mid + 1
+    return _line_start(f, lo)
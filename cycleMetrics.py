@@ -0,0 +1,167 @@
+"""
+Timings and counts of each stage of a poll cycle, exported when the cycle ends.
+
+The poll loop adds each stage's seconds and counts, per service where it has one, to
+a CycleMetrics. end_cycle() then writes them as a Prometheus textfile, replaced
+whole so a node_exporter textfile collector never reads a partial file, and/or
+appends them as one JSON line per cycle. CycleProfile captures a cProfile of one
+whole cycle when asked, by option at startup or later by signal.
+"""
+
+from contextlib import contextmanager
+import json
+import os
+import threading
+from time import perf_counter, time
+
+prefix = 'oarnet_'					# of every Prometheus metric name
+helps = {							# {name: help text} of the per-cycle metrics
+    'http_seconds': 'Seconds waiting for the stats API response',
+    'http_bytes': 'Bytes of the stats API response body',
+    'parse_seconds': 'Seconds decoding the JSON response to records',
+    'rows_received': 'Records received from the stats API',
+    'rows_new': 'Records newer than the previous poll',
+    'trim_seconds': 'Seconds sorting and trimming the records',
+    'detect_seconds': 'Seconds in statChange for the new records',
+    'write_seconds': 'Seconds storing the new records',
+    'alerts': 'Alert lines raised',
+    'cycle_seconds': 'Seconds of the whole poll cycle',
+    'cycle_lag_seconds': 'Seconds the cycle started after its refresh boundary',
+}
+
+
+class CycleMetrics:
+    """Metrics of the current poll cycle, and their export
+
+    Parameters:
+        prom_file (str):	Prometheus textfile rewritten after each cycle. None for none
+        json_file (str):	file appended with a JSON line per cycle. None for none
+        labels (dict):		{label: value} added to every metric, e.g. the member
+    """
+
+    def __init__(self, prom_file: str = None, json_file: str = None, labels: dict = None):
+        self.prom_file = prom_file
+        self.json_file = json_file
+        self.labels = labels or {}
+        self.lock = threading.Lock()		# services are polled by concurrent threads
+        self.values = {}				# {(name, service or None): value} of this cycle
+        self.cycles = 0					# cycles completed
+
+    @property
+    def enabled(self) -> bool:
+        return self.prom_file is not None or self.json_file is not None
+
+    def add(self, name: str, value: float, service: str = None):
+        """Add value to metric name of this cycle"""
+        key = (name, service)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + value
+
+    @contextmanager
+    def timer(self, name: str, service: str = None):
+        """Add the seconds of the with block to metric name"""
+        begin = perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, perf_counter() - begin, service)
+
+    def end_cycle(self, start: float, boundary: float = None):
+        """Export this cycle's metrics, then start the next cycle's
+
+        Parameters:
+            start (float):		epoch seconds when the cycle started
+            boundary (float):	epoch seconds of the refresh boundary it was due. None if none
+        """
+        self.add('cycle_seconds', time() - start)
+        if boundary is not None:
+            self.add('cycle_lag_seconds', start - boundary)
+        self.cycles += 1
+        with self.lock:
+            values, self.values = self.values, {}
+        if self.prom_file is not None:
+            self.write_prom(values, start)
+        if self.json_file is not None:
+            self.write_json(values, start)
+
+    def write_prom(self, values: dict, start: float):
+        """Replace prom_file by values in the Prometheus text format"""
+        lines = []
+        for name in helps:
+            samples = [(service, value) for (n, service), value in values.items() if n == name]
+            if not samples:
+                continue
+            lines.append(f"# HELP {prefix}{name} {helps[name]}")
+            lines.append(f"# TYPE {prefix}{name} gauge")
+            for service, value in sorted(samples, key=lambda s: s[0] or ''):
+                lines.append(f"{prefix}{name}{self.label_str(service)} {value:g}")
+        lines.append(f"# HELP {prefix}cycles_total Poll cycles completed")
+        lines.append(f"# TYPE {prefix}cycles_total counter")
+        lines.append(f"{prefix}cycles_total{self.label_str()} {self.cycles}")
+        lines.append(f"# HELP {prefix}cycle_start_time_seconds Start of the last poll cycle")
+        lines.append(f"# TYPE {prefix}cycle_start_time_seconds gauge")
+        lines.append(f"{prefix}cycle_start_time_seconds{self.label_str()} {start:.3f}")
+        temp = self.prom_file + '.tmp'
+        with open(temp, 'w') as f:
+            f.write('\n'.join(lines) + '\n')
+        os.replace(temp, self.prom_file)
+
+    def label_str(self, service: str = None) -> str:
+        """{label="value",...} of the constant labels and service"""
+        labels = dict(self.labels)
+        if service is not None:
+            labels['service'] = service
+        if not labels:
+            return ''
+        return '{' + ','.join(f'{k}="{v}"' for k, v in labels.items()) + '}'
+
+    def write_json(self, values: dict, start: float):
+        """Append values to json_file as one JSON object line"""
+        line = {'time': start, **self.labels}
+        services = {}
+        for (name, service), value in values.items():
+            if service is None:
+                line[name] = value
+            else:
+                services.setdefault(service, {})[name] = value
+        line['services'] = services
+        with open(self.json_file, 'a') as f:
+            f.write(json.dumps(line) + '\n')
+
+
+class CycleProfile:
+    """cProfile of one poll cycle, taken when requested
+
+    Only the thread calling start() is profiled, so API requests made by a thread pool
+    appear as waits for their results.
+
+    Parameters:
+        file_name (str):	where the pstats of the profiled cycle are dumped
+        requested (bool):	profile the next cycle
+    """
+
+    def __init__(self, file_name: str, requested: bool = False):
+        self.file_name = file_name
+        self.requested = requested
+        self.profile = None				# the running profile
+
+    def request(self, *_):
+        """Profile the next cycle. Usable as a signal handler"""
+        self.requested = True
+
+    def start(self):
+        """Start profiling this cycle, if requested"""
+        if self.requested and self.profile is None:
+            import cProfile
+            self.requested = False
+            self.profile = cProfile.Profile()
+            self.profile.enable()
+
+    def stop(self) -> bool:
+        """Stop profiling, and dump the profile. Return whether a cycle was profiled"""
+        if self.profile is None:
+            return False
+        self.profile.disable()
+        self.profile.dump_stats(self.file_name)
+        self.profile = None
+        return True
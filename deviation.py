@@ -0,0 +1,187 @@
+"""
+Detection of sustained changes in a series, relative to its recent history at the
+same time of the week.
+"""
+
+from array import array
+import math
+import os
+import pickle
+from typing import Union
+
+histLen = 3					# number of [weeks of] history values to keep per slot
+devsLen = 4					# number of consecutive samples to consider
+scale = 1000000				# bytes per unit of the description text
+week = 7*24*60*60			# seconds per week
+snapshotVersion = 1			# format of the files written by save_snapshot
+
+
+def exact(y):
+    """y as int if integral, so that sums of values are exact"""
+    return int(y) if y == int(y) else y
+
+
+def week_slot(x: float, sampling: int) -> int:
+    """Sample period of the week of epoch seconds x, rounded to the nearest"""
+    return int(((x + sampling//2) % week)//sampling)
+
+
+def moments(total, squares, n: int) -> tuple:
+    """Mean and std deviation of n values from their sum and sum of squares
+
+    Parameters:
+        total:				sum of the values
+        squares:			sum of the squares of the values
+        n (int):			number of values, at least 2
+    Returns:
+        (mean, stdev), where stdev is at least 0.2*mean
+    """
+    mean = total/n
+    var = (n*squares - total*total)/(n*(n-1))  # exact numerator if values are int
+    # Anything that can happen, will. Disbelieve unreasonably low stdev
+    return mean, max(0.2*mean, math.sqrt(var) if var > 0 else 0.0)
+
+
+def describe(y, mean: float, stdev: float, dev: float) -> str:
+    """Text describing one deviation, in units of scale bytes"""
+    return f"{int(y/scale):,}={int(mean/scale):,}{dev:+5.1F}*{int(stdev/scale):,}"
+
+
+class Baseline:
+    """Recent values of one attribute of one service, by sample period of the week
+
+    Each of the week's slots keeps a ring of its histLen newest values in one
+    preallocated array, plus their running sum and sum of squares, so a new value is
+    scored and recorded in constant time. The devsLen newest deviations are kept in
+    another ring; their descriptions are formatted only when they raise an alert.
+
+    Parameters:
+        sampling (int):		sample period in seconds
+        hist_len (int):		values kept per slot
+        devs_len (int):		consecutive deviations averaged
+    """
+
+    def __init__(self, sampling: int = 300, hist_len: int = histLen, devs_len: int = devsLen):
+        self.sampling = sampling
+        self.hist_len = hist_len
+        self.devs_len = devs_len
+        self.slots = slots = max(1, week//sampling)
+        self.vals = array('d', bytes(8*slots*hist_len))  # [slot*hist_len + i]
+        self.count = array('H', bytes(2*slots)) 	# number of values in each slot
+        self.head = array('H', bytes(2*slots)) 	# ring index of each slot's oldest value
+        self.sums = [0]*slots					# sum of each slot's values
+        self.squares = [0]*slots				# sum of squares of each slot's values
+        # ring of the newest deviations, and the terms that describe them
+        self.devs = array('d', bytes(8*devs_len))
+        self.ys = array('d', bytes(8*devs_len))
+        self.means = array('d', bytes(8*devs_len))
+        self.stdevs = array('d', bytes(8*devs_len))
+        self.ndevs = 0							# deviations in the ring
+        self.dhead = 0							# ring index of the oldest deviation
+        self.samples = 0						# values recorded since creation
+        self.newest = 0.0						# epoch seconds of the newest value
+
+    def __len__(self) -> int:
+        return self.samples
+
+    def change(self, x: float, y, deviations: float) -> Union[tuple, None]:
+        """Record value y at time x, and test for a reportable change
+
+        Parameters:
+            x (float):			epoch seconds of the value
+            y:					attribute value
+            deviations (float):	average std deviations that is reportable
+        Returns:
+            None, or for a reportable change:
+            dev (float):		average (value - mean)/stdDeviation of devs_len values
+            txt (list):			[description, ...]
+        """
+        y = exact(y)
+        slot = week_slot(x, self.sampling)
+        n = self.count[slot]
+        full = n >= self.hist_len
+        if full:							# hist_len saved values for this slot?
+            mean, stdev = moments(self.sums[slot], self.squares[slot], n)
+            dev = (y-mean)/stdev			# Yes, analyse for changes
+        base = slot*self.hist_len
+        if full:							# replace the oldest value
+            i = base + self.head[slot]
+            old = exact(self.vals[i])
+            self.head[slot] = (self.head[slot] + 1) % self.hist_len
+            self.sums[slot] += y - old
+            self.squares[slot] += y*y - old*old
+        else:								# append the value
+            i = base + n
+            self.count[slot] = n + 1
+            self.sums[slot] += y
+            self.squares[slot] += y*y
+        self.vals[i] = y
+        self.samples += 1
+        self.newest = max(self.newest, x)
+        if not full:
+            return None						# insufficient data for meaningful statistics
+
+        d = self.devs_len
+        appended = self.ndevs < d			# insufficient consecutive samples?
+        if appended:						# Yes, just append new deviation
+            i = self.ndevs
+            self.ndevs += 1
+        else:								# No, replace the oldest
+            i = self.dhead
+            self.dhead = (i + 1) % d
+        self.devs[i], self.ys[i], self.means[i], self.stdevs[i] = dev, y, mean, stdev
+        if appended:
+            return None
+        window = [(self.dhead + j) % d for j in range(d)]  # oldest to newest
+        avg = sum(self.devs[j] for j in window)/d
+        if abs(avg) > deviations:
+            self.ndevs = 0					# prevent repeat reporting of these
+            self.dhead = 0
+            return avg, [describe(exact(self.ys[j]), self.means[j], self.stdevs[j],
+                                  self.devs[j]) for j in window]
+        return None							# no reportable change
+
+
+def watermark(baselines: dict) -> float:
+    """Epoch seconds of the newest value recorded in every one of baselines"""
+    return min((b.newest for b in baselines.values()), default=0.0)
+
+
+def save_snapshot(file_name: str, hist: dict):
+    """Atomically replace file_name with a snapshot of the baselines in hist
+
+    Parameters:
+        file_name (str):	path of the snapshot file
+        hist (dict):		{service:{attr:Baseline}}
+    """
+    snapshot = {'version': snapshotVersion, 'hist': hist}
+    tmp_name = file_name + '.tmp'
+    with open(tmp_name, 'wb') as f:
+        pickle.dump(snapshot, f, pickle.HIGHEST_PROTOCOL)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_name, file_name)		# readers see the old or the new snapshot
+
+
+def load_snapshot(file_name: str, sampling: int) -> Union[dict, None]:
+    """Baselines saved by save_snapshot, if they were learned with the same settings
+
+    Parameters:
+        file_name (str):	path of the snapshot file
+        sampling (int):		sample period in seconds that the baselines must have
+    Returns:
+        {service:{attr:Baseline}}, or None if there is no usable snapshot
+    """
+    try:
+        with open(file_name, 'rb') as f:
+            snapshot = pickle.load(f)
+    except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError):
+        return None
+    if not isinstance(snapshot, dict) or snapshot.get('version') != snapshotVersion:
+        return None
+    hist = snapshot['hist']
+    for baselines in hist.values():
+        for b in baselines.values():
+            if (b.sampling, b.hist_len, b.devs_len) != (sampling, histLen, devsLen):
+                return None				# learned with other settings
+    return hist
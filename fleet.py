@@ -0,0 +1,191 @@
+"""
+Poll many OARnet members and devices, each target in its own worker process.
+
+A JSON config file lists the targets:
+    {
+        "refresh": 15,				minutes between polls of each target
+        "workers": 8,				targets polled at once. Default=number of cores
+        "rate": 2.0,				gateway requests per second, across all targets
+        "resident": "/run/oarnet.sock",	oarnetGeist.py --resident address to poll by. Optional
+        "options": {"deviations": 10, "emails": ["noc@example.edu"]},
+        "targets": [
+            {"member": "KENT", "devices": ["yntww-r9.bb.oar.net"],
+             "services": ["INTERNET", "I2"], "pathname": "/data/KENT",
+             "options": {"drops": 100000}},
+            ...
+        ]
+    }
+Each poll of a target runs oarnetGeist.py --refresh 0 in a new process, with the
+shared options overridden by the target's own, or as a job of the resident process,
+which keeps each target's history and statistics loaded between polls. Either way,
+a poll requests only the smallest --time_frame window that reaches back to the
+target's newest stored record, usually a day rather than a week. Targets keep
+their prevMax, history and learned statistics in their own pathname, so no state is
+shared. Poll start times are staggered evenly across the refresh interval, and a
+target whose previous poll is still running skips a turn rather than delaying the
+others.
+"""
+
+from argparse import ArgumentParser
+from concurrent.futures import ThreadPoolExecutor
+import heapq
+import json
+import os
+import subprocess
+import sys
+import threading
+from time import monotonic, sleep, time
+
+script = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'oarnetGeist.py')
+defaultServices = ['INTERNET', 'I2', 'ONNET']
+
+
+class RateLimit:
+    """Token bucket shared by the threads that start polls
+
+    Taking more tokens than are held leaves the bucket in debt, which the taker
+    waits off, so polls of more requests than burst are still counted in full.
+
+    Parameters:
+        rate (float):		tokens added per second. 0 for no limit
+        burst (float):		most tokens held. Default=rate
+    """
+
+    def __init__(self, rate: float, burst: float = None):
+        self.rate = rate
+        self.burst = max(1.0, burst or rate)
+        self.tokens = self.burst
+        self.stamp = monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self, n: float = 1.0):
+        """Take n tokens, and wait until the bucket is out of debt"""
+        if self.rate <= 0:
+            return
+        with self.lock:
+            now = monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.stamp)*self.rate)
+            self.stamp = now
+            self.tokens -= n
+            wait = -self.tokens/self.rate if self.tokens < 0 else 0.0
+        sleep(wait)
+
+
+def command(target: dict, options: dict) -> list:
+    """oarnetGeist.py command line for one poll of target
+
+    Parameters:
+        target (dict):		{"member", "devices", "services", "pathname", "options"}
+        options (dict):		{option: value} shared by every target
+    Returns:
+        [executable, script, argument, ...]
+    """
+    cmd = [sys.executable, script, target['pathname'], '--refresh', '0',
+           '--member', target['member']]
+    for device in target.get('devices', []):
+        cmd += ['--devices', device]
+    for service in target.get('services', []):
+        cmd += ['--services', service]
+    for name, value in {**options, **target.get('options', {})}.items():
+        flag = '--' + name
+        if value is True:
+            cmd.append(flag)
+        elif value is False or value is None:
+            continue
+        elif isinstance(value, list):
+            for v in value:
+                cmd += [flag, str(v)]
+        else:
+            cmd += [flag, str(value)]
+    return cmd
+
+
+def poll(target: dict, options: dict, limit: RateLimit, timeout: float,
+         resident: str = None) -> tuple:
+    """Run one poll of target, after taking a token per gateway request
+
+    Parameters:
+        resident (str):		address of the resident process to run the poll, or None
+    Returns:
+        (exit status or None if it timed out, output)
+    """
+    try:
+        limit.acquire(len(target.get('services') or defaultServices))
+        if resident is not None:
+            from multiprocessing import ProcessError
+            import oarnetGeist
+            try:
+                return oarnetGeist.submit(resident, command(target, options)[2:], timeout)
+            except TimeoutError:
+                return None, ''
+            except (OSError, EOFError, ProcessError) as e:  # incl. AuthenticationError
+                return 1, f"resident {resident}: {e}"
+        try:
+            done = subprocess.run(command(target, options), capture_output=True, text=True,
+                                  timeout=timeout)
+        except subprocess.TimeoutExpired as e:
+            return None, e.stdout or ''
+        return done.returncode, done.stdout + done.stderr
+    except Exception as e:				# e.g. a target without a pathname, or no process
+        return 1, f"{type(e).__name__}: {e}"
+
+
+def run(config: dict, cycles: int = 0, verbose: bool = False):
+    """Poll every target of config each refresh interval
+
+    Parameters:
+        config (dict):		the parsed config file
+        cycles (int):		polls of each target before returning. 0 for forever
+        verbose (bool):		print each poll's output
+    """
+    targets = config['targets']
+    period = 60*config.get('refresh', 15)
+    options = config.get('options', {})
+    limit = RateLimit(config.get('rate', 0))
+    pool = ThreadPoolExecutor(max_workers=config.get('workers') or os.cpu_count() or 1)
+    running = {}					# {target index: Future of its poll}
+    polls = [0]*len(targets)		# polls of each target started
+    if cycles == 1:					# one poll of each, starting now?
+        due = [(time(), i) for i in range(len(targets))]
+    else:							# target i is i/n of the interval after a multiple
+        boundary = time() - time() % period + period
+        due = [(boundary + i*period/len(targets), i) for i in range(len(targets))]
+    heapq.heapify(due)
+    while due:
+        when, i = heapq.heappop(due)
+        sleep(max(0.0, when - time()))
+        target = targets[i]
+        name = f"{target.get('member')} {target.get('pathname')}"
+        if i in running and not running[i].done():  # previous poll still running?
+            print(f"{name}: previous poll still running, skipped")
+        else:
+            running[i] = pool.submit(poll, target, options, limit, period,
+                                     config.get('resident'))
+            running[i].add_done_callback(
+                lambda f, name=name: report(name, f.result(), verbose))
+        polls[i] += 1
+        if cycles == 0 or polls[i] < cycles:
+            heapq.heappush(due, (when + period, i))
+    pool.shutdown(wait=True)
+
+
+def report(name: str, result: tuple, verbose: bool):
+    """Print the outcome of one poll"""
+    status, output = result
+    if status is None:
+        print(f"{name}: poll timed out")
+    elif status != 0:
+        print(f"{name}: poll failed with status {status}\n{output}")
+    elif verbose and output:
+        print(f"{name}:\n{output}")
+
+
+if __name__ == '__main__':
+    parser = ArgumentParser(description='Poll the OARnet statistics of many targets')
+    parser.add_argument('config', help='JSON file of targets and options')
+    parser.add_argument('--cycles', type=int, default=0,
+                        help='polls of each target, 1 for all now. Default=0 for forever')
+    parser.add_argument('--verbose', action='store_true', default=False)
+    args = parser.parse_args()
+    with open(args.config) as f:
+        run(json.load(f), args.cycles, args.verbose)
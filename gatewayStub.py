@@ -0,0 +1,203 @@
+"""
+Local stand-in for the OARnet gateway stats API, for testing and benchmarks.
+
+Serves GET /stats/api/<devices>/<member>/<service>/<time_frame>/1/<sampling>/<consolidation>
+with the gateway's JSON, {"data": [{"key": column, "values": [{"x": t, "y": v}, ...]}, ...]},
+one series per value column of columns.csvHeaders. The samples end at the latest
+multiple of sampling. A service with a pathname/service.csv file repeats that file's
+values, chosen by sample time so that successive requests agree; other services get
+generated daily-cycle traffic. --scale multiplies the samples of every response.
+Latency and failures (HTTP 503, non-JSON bodies, JSON without "data") are injected
+at the requested rates.
+    python gatewayStub.py [--pathname .] [--port 8080] [--latency 0.2] [--errors 0.05]
+    python oarnetGeist.py out --gateway http://localhost:8080/stats/api --refresh 0
+"""
+
+import csv
+import json
+import math
+import os.path
+import random
+import threading
+from argparse import ArgumentParser
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from time import sleep, time
+
+from columns import csvHeaders, int_or_float
+
+columnCount = len(csvHeaders) - 1		# series per response
+
+
+def generated(x: float, seed: int = 1) -> list:
+    """Values [y1, ..., yn] of generated traffic at time x
+
+    Traffic follows a daily cycle with noise that depends only on x and seed. About one
+    sample in 2000 has dropped bytes. Subscription and Burst match the bundled files.
+    """
+    h = (int(x)*2654435761 + seed*40503) % 4294967296 / 4294967296  # uniform [0, 1)
+    day = math.sin(2*math.pi*(x % 86400)/86400)
+    c2o = int(2e8 + 1e8*day + 6e7*h)
+    o2c = int(5e8 + 3e8*day + 1e8*(1 - h))
+    drops = 20100000000 + (int(h*1e9) if h > 0.9995 else 0)
+    return [c2o, o2c, drops, 20100000000, 20000000000, 20100000000]
+
+
+class Gateway:
+    """Source of the series served for each service, and the faults to inject
+
+    Parameters:
+        pathname (str):		directory of service.csv files to repeat. None to generate
+        scale (int):		multiplier of the samples in each response
+        latency (float):	seconds added before each response
+        jitter (float):		most seconds randomly added to latency
+        errors (float):		fraction of requests that fail
+        seed (int):			seed of generated values and injected faults
+    """
+
+    def __init__(self, pathname: str = None, scale: int = 1, latency: float = 0.0,
+                 jitter: float = 0.0, errors: float = 0.0, seed: int = 1):
+        self.pathname = pathname
+        self.scale = scale
+        self.latency = latency
+        self.jitter = jitter
+        self.errors = errors
+        self.seed = seed
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()		# of self.random, shared by handler threads
+        self.values = {}				# {service: [[y1, ..., yn], ...] of its csv file}
+        self.requests = 0				# requests served
+
+    def rows(self, service: str):
+        """Value rows of pathname/service.csv, or None to generate the service's values"""
+        if self.pathname is None:
+            return None
+        if service not in self.values:
+            try:
+                with open(os.path.join(self.pathname, service) + '.csv', newline='') as f:
+                    self.values[service] = [[int_or_float(v) for v in rec[1:]]
+                                            for rec in list(csv.reader(f))[1:]
+                                            if len(rec) == len(csvHeaders)] or None
+            except FileNotFoundError:
+                self.values[service] = None
+        return self.values[service]
+
+    def records(self, service: str, start: float, end: float, sampling: int):
+        """Generate records [x, y1, ..., yn] of service at multiples of sampling in [start, end)"""
+        rows = self.rows(service)
+        x = start - start % sampling
+        if x < start:
+            x += sampling
+        while x < end:
+            if rows is None:
+                yield [x] + generated(x, self.seed)
+            else:
+                yield [x] + rows[int(x//sampling) % len(rows)]
+            x += sampling
+
+    def response(self, service: str, time_frame: int, sampling: int, now: float = None) -> dict:
+        """Gateway JSON of the time_frame minutes of samples ending at now"""
+        end = (now or time()) // sampling*sampling + sampling
+        start = end - self.scale*60*time_frame
+        series = [[] for _ in range(columnCount)]
+        for rec in self.records(service, start, end, sampling):
+            x = int(rec[0])
+            for values, y in zip(series, rec[1:]):
+                values.append({'x': x, 'y': y})
+        return {'data': [{'key': name, 'values': values}
+                         for name, values in zip(csvHeaders[1:], series)]}
+
+    def fault(self) -> tuple:
+        """(delay seconds, None or the name of a failure to inject) for one request"""
+        with self.lock:
+            self.requests += 1
+            delay = self.latency + self.jitter*self.random.random()
+            if self.random.random() >= self.errors:
+                return delay, None
+            return delay, self.random.choice(('unavailable', 'garbled', 'no data'))
+
+
+class Handler(BaseHTTPRequestHandler):
+    """Requests to the gateway stand-in. server.gateway is its Gateway"""
+
+    def do_GET(self):
+        parts = self.path.strip('/').split('/')
+        if len(parts) != 9 or parts[:2] != ['stats', 'api']:
+            return self.reply(404, b'{"error": "unknown resource"}')
+        if not self.headers.get('Authorization', '').startswith('token '):
+            return self.reply(401, b'{"error": "no token"}')
+        devices, member, service, time_frame, _, sampling, consolidation = parts[2:]
+        try:
+            time_frame, sampling = int(time_frame), int(sampling)
+        except ValueError:
+            return self.reply(400, b'{"error": "time_frame and sampling must be integers"}')
+        if sampling <= 0 or consolidation not in ('avg', 'max'):
+            return self.reply(400, b'{"error": "bad sampling or consolidation"}')
+        gateway = self.server.gateway
+        delay, failure = gateway.fault()
+        sleep(delay)
+        if failure == 'unavailable':
+            return self.reply(503, b'{"error": "unavailable"}')
+        if failure == 'garbled':
+            return self.reply(200, b'<html>proxy error</html>')
+        if failure == 'no data':
+            return self.reply(200, b'{"error": "no data"}')
+        body = json.dumps(gateway.response(service, time_frame, sampling)).encode()
+        self.reply(200, body)
+
+    def reply(self, status: int, body: bytes):
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass							# quiet, unless serving from the command line
+
+
+def serve(gateway: Gateway, port: int = 0, host: str = '127.0.0.1') -> ThreadingHTTPServer:
+    """Start serving gateway in a daemon thread
+
+    Parameters:
+        gateway (Gateway):	what to serve
+        port (int):			port to listen on. 0 for any free port
+        host (str):			address to listen on
+    Returns:				the server. Its URL is url(server); stop it by server.shutdown()
+    """
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    server.gateway = gateway
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def url(server: ThreadingHTTPServer) -> str:
+    """The --gateway URL of a server started by serve()"""
+    host, port = server.server_address[:2]
+    return f"http://{host}:{port}/stats/api"
+
+
+if __name__ == '__main__':
+    parser = ArgumentParser(description='Serve a local stand-in of the OARnet stats API')
+    parser.add_argument('--pathname', default=None,
+                        help='directory of service.csv files to repeat. Default=generated')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--scale', type=int, default=1,
+                        help='multiplier of the samples in each response. Default=1')
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help='seconds before each response. Default=0')
+    parser.add_argument('--jitter', type=float, default=0.0,
+                        help='most random seconds added to latency. Default=0')
+    parser.add_argument('--errors', type=float, default=0.0,
+                        help='fraction of requests that fail. Default=0')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+    Handler.log_message = BaseHTTPRequestHandler.log_message
+    stub = serve(Gateway(args.pathname, args.scale, args.latency, args.jitter, args.errors,
+                         args.seed), args.port, args.host)
+    print(f"Serving {url(stub)}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        stub.shutdown()
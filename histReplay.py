@@ -0,0 +1,156 @@
+"""
+Batch replay of the deviation detector over a whole series.
+
+deviation.Baseline handles one value at a time. replay computes the same alerts
+for an entire series at once: samples are grouped by sample period of the week, the
+histLen-week mean and std deviation of each group and the devsLen-sample average
+deviation are computed with NumPy, and only the few windows that approach the alert
+threshold are re-scored exactly with deviation.moments, so alerts and their text
+are identical to the per-record path for integral values.
+
+Run as a script to check parity with deviation.Baseline and time both:
+    python histReplay.py [pathname] [--weeks 52] [--deviations 3]
+"""
+
+from typing import Sequence
+
+import numpy as np
+
+from deviation import histLen, devsLen, week, describe, exact, moments
+
+_MARGIN = 1e-9						# relative error allowed in the vectorized averages
+
+
+def replay(times: Sequence[float], values: Sequence, deviations: float, sampling: int = 300,
+           hist_len: int = histLen, devs_len: int = devsLen) -> dict:
+    """Alerts of deviation.Baseline.change for a series, starting from a new Baseline
+
+    Parameters:
+        times (sequence):		epoch seconds of each value, increasing
+        values (sequence):		the attribute's values
+        deviations (float):		average std deviations that is reportable
+        sampling (int):			sample period in seconds
+        hist_len (int):			values kept per minute of the week
+        devs_len (int):			consecutive deviations averaged
+    Returns:
+        {index: (avg, [description, ...]), ...} of each value that raised an alert
+    Raises:
+        ZeroDivisionError iff some value has a zero mean and std deviation
+    """
+    y = np.asarray(values, dtype=np.float64)
+    n = len(y)
+    if n == 0:
+        return {}
+    slot = np.floor_divide(np.mod(np.asarray(times, dtype=np.float64) + sampling//2, week),
+                           sampling)
+    order = np.lexsort((np.arange(n), slot))  # by sample period of the week, then time
+    sorted_y = y[order]
+    sorted_slot = slot[order]
+    # rank of each sample within its sample period of the week
+    starts = np.flatnonzero(np.concatenate(([True], sorted_slot[1:] != sorted_slot[:-1])))
+    rank = np.arange(n) - np.repeat(starts, np.diff(np.append(starts, n)))
+    scored = np.flatnonzero(rank >= hist_len)  # positions with a full history
+    if len(scored) == 0:
+        return {}
+    # the previous hist_len values of each scored sample's period of the week
+    window = sorted_y[scored[:, None] - np.arange(hist_len, 0, -1)]
+    mean = window.sum(axis=1)/hist_len
+    stdev = np.sqrt(((window - mean[:, None])**2).sum(axis=1)/(hist_len - 1))
+    stdev = np.maximum(0.2*mean, stdev)
+    if np.any(stdev == 0):
+        raise ZeroDivisionError('float division by zero')
+    rows = order[scored]					# index of each scored value
+    by_row = np.argsort(rows)
+    rows = rows[by_row]						# deviations occur in time order
+    devs = ((sorted_y[scored] - mean)/stdev)[by_row]
+    if len(devs) <= devs_len:
+        return {}
+    # average of each devs_len consecutive deviations, ending at k
+    sums = np.cumsum(np.concatenate(([0.0], devs)))
+    avgs = (sums[devs_len:] - sums[:-devs_len])/devs_len
+    ends = np.arange(devs_len - 1, len(devs))
+    candidates = ends[np.abs(avgs) > deviations*(1 - _MARGIN) - _MARGIN]
+
+    alerts = {}
+    position = np.empty(n, dtype=np.int64)
+    position[order] = np.arange(n)			# sorted position of each value
+    start = 0								# first deviation since the last alert
+    for k in candidates.tolist():
+        if k - start < devs_len:			# cleared by a recent alert?
+            continue
+        exact_devs = []						# exact deviations of the window
+        terms = []							# and their (y, mean, stdev)
+        for row in rows[k - devs_len + 1:k + 1].tolist():
+            pos = position[row]
+            vals = [exact(values[i]) for i in order[pos - hist_len:pos].tolist()]
+            y = exact(values[row])
+            m, s = moments(sum(vals), sum(v*v for v in vals), hist_len)
+            exact_devs.append((y - m)/s)
+            terms.append((y, m, s))
+        avg = sum(exact_devs)/devs_len
+        if abs(avg) > deviations:
+            alerts[int(rows[k])] = (avg, [describe(*t, d) for t, d in zip(terms, exact_devs)])
+            start = k + 1
+    return alerts
+
+
+def _synthesize(weeks: int, sampling: int = 300, seed: int = 1) -> tuple:
+    """Daily-cycle traffic with noise and occasional sustained spikes"""
+    rng = np.random.default_rng(seed)
+    t = 1689337500.0 + sampling*np.arange(weeks*7*24*3600//sampling)
+    day = np.sin(2*np.pi*(t % 86400)/86400)
+    y = 3e8 + 2e8*day + 3e7*rng.standard_normal(len(t))
+    for start in rng.integers(0, len(t) - 12, size=max(1, weeks*2)):
+        y[start:start + 12] *= 4			# an hour of unusual traffic
+    return t.tolist(), np.maximum(y, 1).astype(np.int64).tolist()
+
+
+def _main():
+    """Check replay against deviation.Baseline, and time both"""
+    import csv
+    import os.path
+    from argparse import ArgumentParser
+    from time import perf_counter
+    from pytz import timezone
+    from columns import attrIndex, int_or_float
+    from deviation import Baseline
+    from tsCodec import TimestampCodec
+
+    parser = ArgumentParser(description='Check and time the batch deviation replay')
+    parser.add_argument('pathname', nargs='?', help='directory of service.csv files. '
+                        'Default=synthesized series')
+    parser.add_argument('--deviations', type=float, default=3.0)
+    parser.add_argument('--services', action='append', default=None)
+    parser.add_argument('--weeks', type=int, default=52,
+                        help='weeks of synthesized 5 minute samples. Default=52')
+    args = parser.parse_args()
+    series = {}							# {name: (times, values)}
+    if args.pathname:
+        codec = TimestampCodec(timezone('US/Eastern'))
+        for service in args.services or ['INTERNET', 'I2', 'ONNET']:
+            with open(os.path.join(args.pathname, service) + '.csv', newline='') as f:
+                recs = list(csv.reader(f))[1:]
+            times = codec.parse_column(rec[0] for rec in recs)
+            for attr in ('Client2Oar', 'Oar2Client'):
+                series[f"{service} {attr}"] = \
+                    (times, [int_or_float(rec[attrIndex[attr]]) for rec in recs])
+    else:
+        series[f"{args.weeks} weeks"] = _synthesize(args.weeks)
+    for name, (times, values) in series.items():
+        begin = perf_counter()
+        baseline = Baseline()
+        expected = {}
+        for i, (x, y) in enumerate(zip(times, values)):
+            c = baseline.change(x, y, args.deviations)
+            if c is not None:
+                expected[i] = c
+        middle = perf_counter()
+        actual = replay(times, values, args.deviations)
+        end = perf_counter()
+        assert actual == expected, f"{name}: replay differs from Baseline"
+        print(f"{name}: {len(values)} values, {len(actual)} alerts, per-record "
+              f"{middle - begin:.3f}s, replay {end - middle:.3f}s")
+
+
+if __name__ == '__main__':
+    _main()
@@ -0,0 +1,82 @@
+"""
+Long-lived, buffered appends of new records to a service's csv file.
+
+Each poll cycle's rows are written together and flushed once by commit(). The file
+is fsynced by policy: every fsync_every cycles, and/or whenever the cycle raised an
+alert, so a host running many monitors avoids an open, close and sync per row.
+A crash can leave a partial last line; recover() removes it before appending.
+"""
+
+import csv
+import os
+
+
+def recover(file_name: str) -> int:
+    """Truncate a partial record left at the end of file_name by an interrupted write
+
+    Parameters:
+        file_name (str):	path of the csv file
+    Returns:				number of bytes removed
+    """
+    with open(file_name, 'ab+') as f:
+        end = f.seek(0, os.SEEK_END)
+        pos = end
+        while pos > 0:					# find the last line terminator
+            step = min(4096, pos)
+            f.seek(pos - step)
+            block = f.read(step)
+            nl = block.rfind(b'\n')
+            if nl >= 0:
+                pos = pos - step + nl + 1
+                break
+            pos -= step
+        if pos < end:
+            f.truncate(pos)
+        return end - pos
+
+
+class HistWriter:
+    """Buffered appender of records to one csv file
+
+    Parameters:
+        file_name (str):		path of the csv file
+        headers (list):			header record, written if the file is empty
+        fsync_every (int):		fsync every this many commits. 0 for never
+        fsync_on_alert (bool):	fsync every commit that reports an alert
+    """
+
+    def __init__(self, file_name: str, headers: list, fsync_every: int = 0,
+                 fsync_on_alert: bool = False):
+        self.file_name = file_name
+        self.fsync_every = fsync_every
+        self.fsync_on_alert = fsync_on_alert
+        self.removed = recover(file_name)  # bytes of a partial last record removed
+        self.file = open(file_name, 'a', newline='')
+        self.writer = csv.writer(self.file)
+        if self.file.tell() == 0:		# new, or only a partial header?
+            self.writer.writerow(headers)
+        self.rows = []					# rows of this cycle, not yet written
+        self.commits = 0				# commits since the last fsync
+
+    def write(self, row: list):
+        """Buffer one row, to be written by the next commit()"""
+        self.rows.append(row)
+
+    def commit(self, alert: bool = False):
+        """Write and flush this cycle's rows, and fsync them if the policy requires"""
+        if self.rows:
+            self.writer.writerows(self.rows)
+            self.rows.clear()
+        self.file.flush()
+        self.commits += 1
+        if (self.fsync_every > 0 and self.commits >= self.fsync_every) \
+                or (alert and self.fsync_on_alert):
+            os.fsync(self.file.fileno())
+            self.commits = 0
+
+    def close(self):
+        """Commit any buffered rows, then close the file"""
+        if self.file is not None:
+            self.commit()
+            self.file.close()
+            self.file = None
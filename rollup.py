@@ -0,0 +1,184 @@
+"""
+Hourly and daily summaries of a service's history, kept up to date as records arrive.
+
+Each tier is a csv file, pathname/service.<period>.csv, holding one row per
+complete period. A row has the period's start in epoch seconds, which unlike the
+local date is unambiguous at DST changes, its number of samples, and the avg, max
+and 95th percentile of each value column. The samples of the open
+period of each tier are held in memory until a later sample closes it. Periods
+are aligned to multiples of their length in epoch seconds, i.e. UTC days.
+Summaries over months then read a few kilobytes instead of every 5 minute record.
+Read-only rollups, for queries, leave the files as they are and hold the periods
+the files lack in memory.
+"""
+
+import csv
+import math
+import os
+from typing import Union
+
+import csvTail
+from columns import int_or_float
+
+tiers = (3600, 86400)				# seconds per period of each tier, finest first
+consolidations = ('avg', 'max', 'p95')
+
+
+def p95(vals: list):
+    """95th percentile of vals, by the nearest-rank method"""
+    ordered = sorted(vals)
+    return ordered[max(0, math.ceil(0.95*len(ordered)) - 1)]
+
+
+def summarize(recs: list) -> list:
+    """[count, avg, max, p95 of column 1, ..., avg, max, p95 of column n] of recs"""
+    row = [len(recs)]
+    for column in list(zip(*recs))[1:]:
+        avg = sum(column)/len(column)
+        row += [int(avg) if avg == int(avg) else avg, max(column), p95(column)]
+    return row
+
+
+class Tier:
+    """Summaries of one service over periods of one length
+
+    Parameters:
+        file_name (str):		path of the tier's csv file
+        period (int):			seconds per period
+        headers (list):			column names of the records, epoch first
+        readonly (bool):		never write the file, keep closed rows in memory
+    """
+
+    def __init__(self, file_name: str, period: int, headers: list, readonly: bool = False):
+        self.file_name = file_name
+        self.period = period
+        self.readonly = readonly
+        self.unwritten = []				# closed rows not in the file, iff readonly
+        self.headers = ['Epoch', 'Samples'] \
+            + [f"{name}.{c}" for name in headers[1:] for c in consolidations]
+        self.start = None				# start of the open period
+        self.recs = []					# records of the open period
+        self.closed = 0.0				# end of the newest period in the file
+        try:
+            with open(file_name, 'rb') as f:
+                last = csvTail.last_record(f, self.row_time)
+        except FileNotFoundError:
+            last = None
+        if last is not None:
+            self.closed = last[1] + period
+        if not readonly and (not os.path.exists(file_name) or os.path.getsize(file_name) == 0):
+            with open(file_name, 'w', newline='') as f:
+                csv.writer(f).writerow(self.headers)
+
+    @staticmethod
+    def row_time(row: list) -> Union[float, None]:
+        """Start of the period of a tier csv row, or None if it has none"""
+        try:
+            return float(row[0])
+        except (IndexError, ValueError):
+            return None
+
+    def append(self, recs: list) -> list:
+        """Add records [x, y1, ..., yn] in increasing x order. Return closed rows"""
+        closed = []
+        for rec in recs:
+            x = rec[0]
+            if x < self.closed:			# period already in the file?
+                continue
+            start = x - x % self.period
+            if start != self.start:		# record of a new period?
+                if self.recs:
+                    closed.append([self.start] + summarize(self.recs))
+                self.start = start
+                self.recs = []
+            self.recs.append(rec)
+        if closed:
+            if self.readonly:
+                self.unwritten += closed
+            else:
+                with open(self.file_name, 'a', newline='') as f:
+                    csv.writer(f).writerows([int(row[0])] + row[1:] for row in closed)
+            self.closed = closed[-1][0] + self.period
+        return closed
+
+    def rows(self, start: float, end: float):
+        """Generate rows [x, count, avg, max, p95, ...] of periods starting in [start, end)
+
+        The open period is included, summarizing its samples so far.
+        """
+        try:
+            with open(self.file_name, 'rb') as f:
+                f.seek(csvTail.seek_after(f, start - 1, self.row_time))
+                for line in f:
+                    row = csvTail.record(line)
+                    x = self.row_time(row)
+                    if x is None:
+                        continue
+                    if x >= end:
+                        return
+                    yield [x] + [int_or_float(v) for v in row[1:]]
+        except FileNotFoundError:		# read-only, and never written
+            pass
+        for row in self.unwritten:
+            if start <= row[0] < end:
+                yield row
+        if self.recs and start <= self.start < end:
+            yield [self.start] + summarize(self.recs)
+
+
+class Rollups:
+    """Every tier of one service
+
+    Parameters:
+        prefix (str):			path of the service's history, without extension
+        headers (list):			column names of the records, epoch first
+        readonly (bool):		never write the tier files
+    """
+
+    def __init__(self, prefix: str, headers: list, readonly: bool = False):
+        self.tiers = [Tier(f"{prefix}.{period}.csv", period, headers, readonly)
+                      for period in tiers]
+
+    @property
+    def resume_after(self) -> float:
+        """Records newer than this are needed to reopen every tier's open period"""
+        return min(tier.closed for tier in self.tiers) - 1
+
+    def append(self, recs: list):
+        """Add records [x, y1, ..., yn], in increasing x order, to every tier"""
+        for tier in self.tiers:
+            tier.append(recs)
+
+    def query(self, start: float, end: float, sampling: int, consolidation: str) -> dict:
+        """Summaries of [start, end) from the coarsest tier whose period divides sampling
+
+        Parameters:
+            start (float):			epoch seconds of the first period
+            end (float):			epoch seconds after the last period
+            sampling (int):			seconds per returned sample
+            consolidation (str):	one of "avg", "max", "p95". Combining several
+                                    periods of a tier, p95 is the max of their p95s.
+        Returns:
+            {x: [y1, ..., yn]}
+        Raises:
+            ValueError if no tier divides sampling, or consolidation is unknown
+        """
+        tier = next((t for t in reversed(self.tiers) if sampling % t.period == 0), None)
+        if tier is None or consolidation not in consolidations:
+            raise ValueError(f"no {consolidation} rollup with sampling {sampling}")
+        which = consolidations.index(consolidation)
+        result = {}
+        counts = {}						# {x: samples combined into result[x]}
+        for row in tier.rows(start - start % sampling, end):
+            x = row[0] - row[0] % sampling
+            n = row[1]
+            vals = row[2 + which::len(consolidations)]
+            if x not in result:
+                result[x], counts[x] = vals, n
+            elif consolidation == 'avg':	# sample weighted average
+                total = counts[x] + n
+                result[x] = [(a*counts[x] + b*n)/total for a, b in zip(result[x], vals)]
+                counts[x] = total
+            else:
+                result[x] = [max(a, b) for a, b in zip(result[x], vals)]
+        return result
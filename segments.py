@@ -0,0 +1,283 @@
+"""
+History of one service split into monthly segments, with a manifest.
+
+A segmented history is a directory, pathname/service.seg, holding
+    YYYY-MM.csv			the records of the current month, appended in place
+    YYYY-MM.csv.gz		the records of each earlier month, gzip compressed when closed
+    manifest.json		{"version": 1, "segments": [{"name", "first", "last", "records"}, ...]}
+                        of the closed segments, oldest first
+Months are UTC, as rollup periods are, so segment boundaries are unambiguous. The
+manifest lets readers skip every segment outside the requested time range without
+opening it, so learning and polling touch only the newest segments. A retention
+limit deletes the oldest closed segments. A segment left uncompressed, or compressed
+but not in the manifest, by an interrupted rotation is finished when the history is
+next opened. A read-only history, for --history and queries, changes no file: such
+segments are read as they are, and no segment is compressed or deleted.
+"""
+
+import calendar
+import gzip
+import json
+import math
+import os
+import shutil
+from time import gmtime, strftime
+from typing import Callable, Iterator, Union
+
+import csvTail
+import histWriter
+from columns import int_or_float
+
+manifestVersion = 1
+
+
+def segment_key(x: float) -> str:
+    """YYYY-MM of the UTC month of epoch seconds x"""
+    return strftime('%Y-%m', gmtime(x))
+
+
+def month_bounds(key: str) -> tuple:
+    """(first, after last) epoch seconds of the UTC month YYYY-MM"""
+    year, month = int(key[:4]), int(key[5:7])
+    start = calendar.timegm((year, month, 1, 0, 0, 0))
+    year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return start, calendar.timegm((year, month, 1, 0, 0, 0))
+
+
+class SegmentedHistory:
+    """Monthly segments of one service's csv history
+
+    Parameters:
+        path (str):				directory of the segments
+        headers (list):			header record of each segment
+        parse (callable):		parse(date_str) --> epoch seconds
+        format_ (callable):		format_(epoch seconds) --> date_str
+        retention (int):		closed segments kept. 0 to keep all
+        fsync_every (int):		as for HistWriter, of the current segment
+        fsync_on_alert (bool):	as for HistWriter, of the current segment
+        readonly (bool):		only read the segments
+    """
+
+    def __init__(self, path: str, headers: list, parse: Callable, format_: Callable,
+                 retention: int = 0, fsync_every: int = 0, fsync_on_alert: bool = False,
+                 readonly: bool = False):
+        self.path = path
+        self.headers = headers
+        self.parse = parse
+        self.format = format_
+        self.retention = retention
+        self.fsync_every = fsync_every
+        self.fsync_on_alert = fsync_on_alert
+        self.readonly = readonly
+        self.manifest_name = os.path.join(path, 'manifest.json')
+        self.closed = []				# manifest entries of the closed segments, oldest first
+        self.key = None					# YYYY-MM of the current segment
+        self.bounds = (math.inf, -math.inf)  # epoch seconds [first, after last) of it
+        self.writer = None				# HistWriter of the current segment, once written
+        if not readonly:
+            os.makedirs(path, exist_ok=True)
+        self._load()
+
+    def _time(self, rec: list) -> Union[float, None]:
+        """Epoch seconds of a csv record, or None if it has no valid date"""
+        try:
+            return self.parse(rec[0])
+        except (IndexError, ValueError):
+            return None
+
+    def _load(self):
+        """Read the manifest, and finish any rotation that was interrupted, unless readonly"""
+        try:
+            with open(self.manifest_name) as f:
+                manifest = json.load(f)
+            if manifest.get('version') == manifestVersion:
+                self.closed = manifest['segments']
+        except (FileNotFoundError, ValueError, KeyError):
+            self.closed = []
+        names = set(os.listdir(self.path)) if os.path.isdir(self.path) else set()
+        self.closed = [entry for entry in self.closed if entry['name'] in names]
+        listed = {entry['name'] for entry in self.closed}
+        for name in sorted(names):		# closed, but not yet removed?
+            if name.endswith('.csv') and name + '.gz' in listed:
+                if not self.readonly:
+                    os.remove(os.path.join(self.path, name))
+                names.discard(name)
+        for name in sorted(names):		# compressed, but not yet in the manifest?
+            if name.endswith('.csv.gz') and name not in listed:
+                if name[:-3] in names:	# the compression may be incomplete
+                    if not self.readonly:
+                        os.remove(os.path.join(self.path, name))
+                else:
+                    self.closed.append(self._entry(name))
+        open_keys = sorted(name[:-4] for name in names if name.endswith('.csv'))
+        for key in open_keys[:-1]:		# segments not closed by their rotation
+            if self.readonly:
+                self.closed.append(self._entry(key + '.csv'))
+            else:
+                self._close(key)
+        if open_keys:
+            self.key = open_keys[-1]
+            self.bounds = month_bounds(self.key)
+        self.closed.sort(key=lambda entry: entry['name'])
+        if not self.readonly:
+            self._retain()
+            self._save()
+
+    def _save(self):
+        """Replace the manifest, so a reader never sees a partial one"""
+        temp = self.manifest_name + '.tmp'
+        with open(temp, 'w') as f:
+            json.dump({'version': manifestVersion, 'segments': self.closed}, f, indent=1)
+        os.replace(temp, self.manifest_name)
+
+    def _lines(self, name: str) -> Iterator[bytes]:
+        """Generate the lines of segment file name"""
+        opener = gzip.open if name.endswith('.gz') else open
+        with opener(os.path.join(self.path, name), 'rb') as f:
+            yield from f
+
+    def _entry(self, name: str) -> dict:
+        """Manifest entry of segment file name, by reading it"""
+        first = last = None
+        count = 0
+        for line in self._lines(name):
+            x = self._time(csvTail.record(line))
+            if x is not None:
+                first = x if first is None else first
+                last = x
+                count += 1
+        return {'name': name, 'first': first, 'last': last, 'records': count}
+
+    def _close(self, key: str):
+        """Compress the segment of month key, and list it in the manifest"""
+        name = key + '.csv'
+        csv_name = os.path.join(self.path, name)
+        histWriter.recover(csv_name)	# without a partial last record
+        with open(csv_name, 'rb') as src, gzip.open(csv_name + '.gz.tmp', 'wb', 6) as dst:
+            shutil.copyfileobj(src, dst)
+        with open(csv_name + '.gz.tmp', 'rb') as f:
+            os.fsync(f.fileno())
+        os.replace(csv_name + '.gz.tmp', csv_name + '.gz')
+        self.closed.append(self._entry(name + '.gz'))
+        self._save()
+        os.remove(csv_name)				# only once the manifest lists its replacement
+
+    def _retain(self):
+        """Delete the oldest closed segments beyond the retention limit"""
+        if self.retention <= 0 or len(self.closed) <= self.retention:
+            return
+        dropped, self.closed = self.closed[:-self.retention], self.closed[-self.retention:]
+        self._save()
+        for entry in dropped:
+            os.remove(os.path.join(self.path, entry['name']))
+
+    @property
+    def empty(self) -> bool:
+        return not self.closed and self.key is None
+
+    def last_time(self) -> Union[float, None]:
+        """Epoch seconds of the newest record, or None if there are none"""
+        if self.key is not None:
+            with open(os.path.join(self.path, self.key + '.csv'), 'rb') as f:
+                last = csvTail.last_record(f, self._time)
+            if last is not None:
+                return last[1]
+        for entry in reversed(self.closed):
+            if entry['last'] is not None:
+                return entry['last']
+        return None
+
+    def records(self, t: float = -math.inf, end: float = math.inf) -> Iterator[list]:
+        """Generate the records [x, y1, ..., yn] with t < x < end, oldest first
+
+        Segments wholly outside (t, end) are skipped, by the manifest.
+        """
+        for entry in list(self.closed):
+            if entry['last'] is None or entry['last'] <= t:
+                continue
+            if entry['first'] >= end:
+                return
+            yield from self._read(self._lines(entry['name']), t, end)
+        if self.key is None or self.bounds[0] >= end:
+            return
+        if self.writer is not None:
+            self.writer.commit()			# rows written, but not yet committed
+        with open(os.path.join(self.path, self.key + '.csv'), 'rb') as f:
+            f.seek(csvTail.seek_after(f, t, self._time))
+            yield from self._read(f, t, end)
+
+    def _read(self, lines, t: float, end: float) -> Iterator[list]:
+        """Generate the parsed records of lines with t < x < end"""
+        for line in lines:
+            if not line.endswith(b'\n'):	# partial last record
+                return
+            rec = csvTail.record(line)
+            x = self._time(rec)
+            if x is None or x <= t:
+                continue
+            if x >= end:
+                return
+            try:
+                yield [x] + [int_or_float(v) for v in rec[1:]]
+            except ValueError:
+                continue				# bad record ignored
+
+    def write(self, rec: list):
+        """Buffer record [x, y1, ..., yn], starting a new segment at each new month"""
+        x = rec[0]
+        if self.writer is None or x >= self.bounds[1]:
+            self._rotate(segment_key(x) if x >= self.bounds[1] else self.key)
+        self.writer.write([self.format(x)] + rec[1:])
+
+    def _rotate(self, key: str):
+        """Make month key the current segment, closing the previous one"""
+        if key != self.key:
+            if self.writer is not None:
+                self.writer.close()
+                self.writer = None
+            if self.key is not None:
+                self._close(self.key)
+                self._retain()
+            self.key = key
+            self.bounds = month_bounds(key)
+        if self.writer is None:
+            self.writer = histWriter.HistWriter(
+                os.path.join(self.path, key + '.csv'), self.headers, self.fsync_every,
+                self.fsync_on_alert)
+
+    def commit(self, alert: bool = False):
+        """Write and flush the buffered records, as HistWriter.commit"""
+        if self.writer is not None:
+            self.writer.commit(alert)
+
+    def close(self):
+        """Commit any buffered records, and close the current segment"""
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+
+    def import_csv(self, csv_name: str) -> int:
+        """Append the records of a csv file, newer than those here, to the segments
+
+        Returns:				number of records appended
+        """
+        newest = self.last_time()
+        newest = -math.inf if newest is None else newest
+        count = 0
+        with open(csv_name, 'rb') as f:
+            for line in f:
+                rec = csvTail.record(line)
+                x = self._time(rec)
+                if x is None or x <= newest or len(rec) != len(self.headers):
+                    continue
+                try:
+                    rec = [x] + [int_or_float(v) for v in rec[1:]]
+                except ValueError:
+                    continue			# bad record ignored
+                self.write(rec)
+                newest = x
+                count += 1
+                if count % 10000 == 0:
+                    self.commit()
+        self.commit()
+        return count
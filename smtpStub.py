@@ -0,0 +1,97 @@
+"""
+Local SMTP server that accepts every message, for testing alert delivery.
+
+Messages are kept in memory, as server.messages, and printed when run from the
+command line:
+    python smtpStub.py [--port 8025] [--delay 5]
+    python oarnetGeist.py out --smtp localhost:8025 ...
+--delay holds each reply to DATA, to act as a slow mail server.
+"""
+
+from argparse import ArgumentParser
+from email import message_from_bytes
+import socketserver
+import threading
+from time import sleep
+
+
+class Handler(socketserver.StreamRequestHandler):
+    """One SMTP session. server.messages receives (sender, recipients, message bytes)"""
+
+    def reply(self, line: str):
+        self.wfile.write(line.encode() + b'\r\n')
+
+    def handle(self):
+        self.reply('220 smtpStub ready')
+        sender, recipients = None, []
+        for line in self.rfile:
+            command = line.decode(errors='replace').strip()
+            verb = command[:4].upper()
+            if verb in ('HELO', 'EHLO'):
+                self.reply('250 smtpStub')
+            elif verb == 'MAIL':
+                sender, recipients = command.split(':', 1)[1].strip(), []
+                self.reply('250 OK')
+            elif verb == 'RCPT':
+                recipients.append(command.split(':', 1)[1].strip())
+                self.reply('250 OK')
+            elif verb == 'DATA':
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+                data = []
+                for body_line in self.rfile:
+                    if body_line in (b'.\r\n', b'.\n'):
+                        break
+                    data.append(body_line[1:] if body_line.startswith(b'..') else body_line)
+                sleep(self.server.delay)
+                with self.server.lock:
+                    self.server.messages.append((sender, recipients, b''.join(data)))
+                if self.server.verbose:
+                    msg = message_from_bytes(b''.join(data))
+                    print(f"From {sender} to {', '.join(recipients)}: {msg['Subject']}\n"
+                          + str(msg.get_payload()))
+                self.reply('250 OK')
+            elif verb == 'QUIT':
+                self.reply('221 Bye')
+                return
+            elif verb in ('RSET', 'NOOP'):
+                self.reply('250 OK')
+            else:
+                self.reply('502 Command not implemented')
+
+
+def serve(port: int = 0, host: str = '127.0.0.1', delay: float = 0.0,
+          verbose: bool = False) -> socketserver.ThreadingTCPServer:
+    """Start an SMTP server in a daemon thread
+
+    Parameters:
+        port (int):			port to listen on. 0 for any free port
+        host (str):			address to listen on
+        delay (float):		seconds to hold each message before accepting it
+        verbose (bool):		print each message
+    Returns:				the server. server.server_address is (host, port);
+                            stop it by server.shutdown()
+    """
+    socketserver.ThreadingTCPServer.allow_reuse_address = True
+    server = socketserver.ThreadingTCPServer((host, port), Handler)
+    server.daemon_threads = True
+    server.messages = []
+    server.lock = threading.Lock()
+    server.delay = delay
+    server.verbose = verbose
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == '__main__':
+    parser = ArgumentParser(description='Accept and print SMTP messages')
+    parser.add_argument('--port', type=int, default=8025)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--delay', type=float, default=0.0,
+                        help='seconds before accepting each message. Default=0')
+    args = parser.parse_args()
+    stub = serve(args.port, args.host, args.delay, verbose=True)
+    print(f"Accepting SMTP at {args.host}:{args.port}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        stub.shutdown()
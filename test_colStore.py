@@ -0,0 +1,66 @@
+"""
+Tests of colStore.ColumnStore recovery from an interrupted append.
+"""
+
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from colStore import ColumnStore, RUN_TYPE, VALUE_TYPE
+
+
+def record(i: int, burst: float) -> list:
+    return [1600000000 + 300*i, 1000 + i, 2000 + i, 0, 0, 100, burst]
+
+
+class TestRepair(unittest.TestCase):
+    def setUp(self):
+        self.temp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.temp.name, 'INTERNET.col')
+        store = ColumnStore(self.path)
+        store.append([record(i, 5.0) for i in range(5)])
+
+    def tearDown(self):
+        self.temp.cleanup()
+
+    def test_uncommitted_run(self):
+        """A run of a row beyond Date.i8, and a partial run, are dropped"""
+        run = np.array([(5, 7.0)], RUN_TYPE)
+        with open(os.path.join(self.path, 'Burst.rle'), 'ab') as f:
+            f.write(run.tobytes() + b'\x01\x02\x03')
+        with open(os.path.join(self.path, 'Client2Oar.f8'), 'ab') as f:
+            f.write(np.array([1.0], VALUE_TYPE).tobytes()[:5])
+        store = ColumnStore(self.path)
+        self.assertEqual(len(store), 5)
+        self.assertEqual(len(store.runs('Burst')), 1)
+        store.append([record(5, 9.0), record(6, 9.0)])
+        store = ColumnStore(self.path)
+        self.assertEqual(store.column('Burst').tolist(), [5.0]*5 + [9.0]*2)
+        self.assertEqual(store.runs('Burst')['row'].tolist(), [0, 5])
+        self.assertEqual(store.column('Client2Oar').tolist(), [1000.0 + i for i in range(7)])
+
+    def test_partial_epoch(self):
+        """A partial last epoch uncommits its record"""
+        with open(os.path.join(self.path, 'Date.i8'), 'ab') as f:
+            f.write(b'\x00'*3)
+        self.assertEqual(len(ColumnStore(self.path, readonly=True)), 5)
+        store = ColumnStore(self.path)
+        self.assertEqual(os.path.getsize(os.path.join(self.path, 'Date.i8')), 5*8)
+        self.assertEqual(list(store.records())[-1], record(4, 5))
+
+    def test_readonly(self):
+        """A read-only store changes no file, and cannot be appended to"""
+        name = os.path.join(self.path, 'Burst.rle')
+        with open(name, 'ab') as f:
+            f.write(np.array([(5, 7.0)], RUN_TYPE).tobytes())
+        size = os.path.getsize(name)
+        store = ColumnStore(self.path, readonly=True)
+        self.assertEqual(store.column('Burst').tolist(), [5.0]*5)
+        self.assertEqual(os.path.getsize(name), size)
+        self.assertRaises(ValueError, store.append, [record(5, 9.0)])
+
+
+if __name__ == '__main__':
+    unittest.main()
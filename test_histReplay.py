@@ -0,0 +1,48 @@
+"""
+Tests of histReplay.replay against the per-record deviation.Baseline.
+"""
+
+import unittest
+
+from deviation import Baseline, devsLen
+from histReplay import _synthesize, replay
+
+
+def baseline_alerts(times, values, deviations: float) -> dict:
+    """{index: change} of each reportable change of Baseline, record by record"""
+    baseline = Baseline()
+    alerts = {}
+    for i, (x, y) in enumerate(zip(times, values)):
+        c = baseline.change(x, y, deviations)
+        if c is not None:
+            alerts[i] = c
+    return alerts
+
+
+class TestReplay(unittest.TestCase):
+    def test_synthesized(self):
+        for seed in (1, 2, 3):
+            times, values = _synthesize(6, seed=seed)
+            for deviations in (1.0, 2.0, 3.0, 5.0):
+                with self.subTest(seed=seed, deviations=deviations):
+                    self.assertEqual(replay(times, values, deviations),
+                                     baseline_alerts(times, values, deviations))
+
+    def test_alert_reset(self):
+        """A sustained step is reported again once devsLen new deviations follow"""
+        times, values = _synthesize(5, seed=4)
+        step = len(values) - 300
+        values = values[:step] + [10*y for y in values[step:]]
+        expected = baseline_alerts(times, values, 3.0)
+        indexes = [i for i in sorted(expected) if i >= step]
+        self.assertEqual(indexes[:3], [step, step + devsLen + 1, step + 2*(devsLen + 1)])
+        self.assertEqual(replay(times, values, 3.0), expected)
+
+    def test_short(self):
+        times, values = _synthesize(1)
+        self.assertEqual(replay(times, values, 3.0), {})
+        self.assertEqual(replay([], [], 3.0), {})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+"""
+Tests of histWriter recovery from an interrupted write.
+"""
+
+import os
+import tempfile
+import unittest
+
+from histWriter import HistWriter, recover
+
+headers = ['Date', 'Value']
+
+
+class TestRecover(unittest.TestCase):
+    def setUp(self):
+        self.temp = tempfile.TemporaryDirectory()
+        self.name = os.path.join(self.temp.name, 'INTERNET.csv')
+
+    def tearDown(self):
+        self.temp.cleanup()
+
+    def read(self) -> str:
+        with open(self.name) as f:
+            return f.read()
+
+    def test_torn_line(self):
+        """A partial last line is removed before the next rows are appended"""
+        with open(self.name, 'w') as f:
+            f.write('Date,Value\n1,10\n2,2')
+        writer = HistWriter(self.name, headers)
+        self.assertEqual(writer.removed, 3)
+        writer.write([2, 20])
+        writer.write([3, 30])
+        writer.close()
+        self.assertEqual(self.read(), 'Date,Value\n1,10\n2,20\n3,30\n')
+
+    def test_torn_header(self):
+        """A partial header is rewritten whole"""
+        with open(self.name, 'w') as f:
+            f.write('Date,Va')
+        writer = HistWriter(self.name, headers)
+        writer.write([1, 10])
+        writer.close()
+        self.assertEqual(writer.removed, 7)
+        self.assertEqual(self.read(), 'Date,Value\n1,10\n')
+
+    def test_whole_lines(self):
+        """A file of whole lines is unchanged, however long its last line"""
+        last = '2,' + '9'*10000 + '\n'
+        with open(self.name, 'w') as f:
+            f.write('Date,Value\n' + last)
+        self.assertEqual(recover(self.name), 0)
+        self.assertEqual(recover(os.path.join(self.temp.name, 'new.csv')), 0)
+        self.assertEqual(self.read(), 'Date,Value\n' + last)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+"""
+Tests of segments.SegmentedHistory recovery from an interrupted rotation.
+"""
+
+import gzip
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from segments import SegmentedHistory, month_bounds
+
+headers = ['Date', 'Value']
+january = month_bounds('2024-01')[0]
+february = month_bounds('2024-02')[0]
+
+
+def open_history(path: str, **kwargs) -> SegmentedHistory:
+    return SegmentedHistory(path, headers, float, lambda x: str(int(x)), **kwargs)
+
+
+class TestRotation(unittest.TestCase):
+    def setUp(self):
+        self.temp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.temp.name, 'INTERNET.seg')
+        history = open_history(self.path)
+        self.expected = [[float(x), i] for i, x in
+                         enumerate([january + 300, january + 600, february + 300])]
+        for rec in self.expected:
+            history.write(rec)
+        history.close()
+        self.assertEqual(sorted(os.listdir(self.path)),
+                         ['2024-01.csv.gz', '2024-02.csv', 'manifest.json'])
+
+    def tearDown(self):
+        self.temp.cleanup()
+
+    def leave_csv(self):
+        """The closed January segment, as left uncompressed by a crash before its removal"""
+        name = os.path.join(self.path, '2024-01.csv')
+        with gzip.open(name + '.gz', 'rb') as src, open(name, 'wb') as dst:
+            shutil.copyfileobj(src, dst)
+        return name
+
+    def test_leftover_csv(self):
+        """A csv beside its listed csv.gz is removed, not read twice"""
+        name = self.leave_csv()
+        history = open_history(self.path)
+        self.assertFalse(os.path.exists(name))
+        self.assertEqual(list(history.records()), self.expected)
+        self.assertEqual([entry['name'] for entry in history.closed], ['2024-01.csv.gz'])
+
+    def test_leftover_csv_readonly(self):
+        """A read-only history ignores the leftover csv, and leaves it"""
+        name = self.leave_csv()
+        history = open_history(self.path, readonly=True)
+        self.assertTrue(os.path.exists(name))
+        self.assertEqual(list(history.records()), self.expected)
+
+    def test_unlisted_gz(self):
+        """A csv.gz missing from the manifest, beside its csv, is compressed again"""
+        self.leave_csv()
+        manifest_name = os.path.join(self.path, 'manifest.json')
+        with open(manifest_name, 'w') as f:
+            json.dump({'version': 1, 'segments': []}, f)
+        with open(os.path.join(self.path, '2024-01.csv.gz'), 'r+b') as f:
+            f.truncate(10)				# compression incomplete
+        history = open_history(self.path)
+        self.assertEqual(sorted(os.listdir(self.path)),
+                         ['2024-01.csv.gz', '2024-02.csv', 'manifest.json'])
+        self.assertEqual(list(history.records()), self.expected)
+        self.assertEqual(history.closed[0]['records'], 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,125 @@
+"""
+Sparse time index of a time-ordered csv history file.
+
+The index, kept beside the file as <file>.idx, is an array of (epoch seconds, byte
+offset) pairs for every stride-th record. The records of any [start, end) range are
+found by binary search of the index, then read lazily from that offset. The index
+is extended by reading only the records appended since it was last brought up to
+date, and is rebuilt if the csv file no longer matches it.
+"""
+
+from array import array
+import bisect
+import os
+from typing import Callable, Iterator
+
+import csvTail
+from columns import int_or_float
+
+
+class TimeIndex:
+    """Index of the record times of one csv file
+
+    Parameters:
+        csv_name (str):		path of the csv file
+        parse (callable):	parse(rec) --> record time, or None if rec has none
+        stride (int):		records per index entry
+    """
+
+    def __init__(self, csv_name: str, parse: Callable, stride: int = 64):
+        self.csv_name = csv_name
+        self.idx_name = csv_name + '.idx'
+        self.parse = parse
+        self.stride = stride
+        self.times = array('d')			# epoch seconds of each indexed record
+        self.offsets = array('q')		# byte offset of each indexed record
+        self.scanned = 0				# offset after the last record read
+        self.since = 0					# records read since the last index entry
+        self._load()
+
+    def _load(self):
+        """Read the index file, keeping it only if it matches the csv file"""
+        try:
+            with open(self.idx_name, 'rb') as f:
+                pairs = array('d', f.read())
+        except (FileNotFoundError, ValueError):
+            pairs = array('d')
+        if len(pairs) % 2:				# torn last entry
+            pairs = pairs[:-1]
+        self.times = pairs[0::2]
+        self.offsets = array('q', (int(off) for off in pairs[1::2]))
+        if self.offsets and not self._valid(len(self.offsets) - 1):
+            self.times, self.offsets = array('d'), array('q')
+        if self.offsets:				# resume after the last indexed record
+            self.scanned = self.offsets[-1]
+            self.since = -1				# that record is read again
+        with open(self.idx_name, 'wb') as f:  # drop any torn or stale entries
+            f.write(self._pairs(0))
+
+    def _valid(self, i: int) -> bool:
+        """Whether index entry i still locates its record in the csv file"""
+        try:
+            with open(self.csv_name, 'rb') as f:
+                f.seek(self.offsets[i])
+                line = f.readline()
+        except FileNotFoundError:
+            return False
+        return line.endswith(b'\n') and self.parse(csvTail.record(line)) == self.times[i]
+
+    def _pairs(self, first: int) -> bytes:
+        """Entries [first:] as (time, offset) pairs of the index file"""
+        pairs = array('d')
+        for i in range(first, len(self.times)):
+            pairs.append(self.times[i])
+            pairs.append(float(self.offsets[i]))
+        return pairs.tobytes()
+
+    def refresh(self):
+        """Index the records appended to the csv file since the last refresh"""
+        first = len(self.times)
+        with open(self.csv_name, 'rb') as f:
+            if os.fstat(f.fileno()).st_size < self.scanned:  # file was replaced?
+                self.times, self.offsets = array('d'), array('q')
+                self.scanned, self.since, first = 0, 0, 0
+            f.seek(self.scanned)
+            pos = self.scanned
+            for line in f:
+                if not line.endswith(b'\n'):  # partial last record
+                    break
+                x = self.parse(csvTail.record(line))
+                if x is not None:
+                    if not self.times or self.since >= self.stride:
+                        self.times.append(x)
+                        self.offsets.append(pos)
+                        self.since = 0
+                    self.since += 1
+                pos += len(line)
+            self.scanned = pos
+        with open(self.idx_name, 'wb' if first == 0 else 'ab') as f:
+            f.write(self._pairs(first))
+
+    def range(self, start: float, end: float) -> Iterator[list]:
+        """Generate the records [x, y1, ..., yn] with start <= x < end
+
+        Parameters:
+            start (float):	epoch seconds of the first record
+            end (float):	epoch seconds after the last record
+        """
+        self.refresh()
+        i = bisect.bisect_right(self.times, start) - 1
+        offset = self.offsets[i] if i >= 0 else 0
+        with open(self.csv_name, 'rb') as f:
+            f.seek(offset)
+            for line in f:
+                if not line.endswith(b'\n'):  # partial last record
+                    return
+                rec = csvTail.record(line)
+                x = self.parse(rec)
+                if x is None or x < start:
+                    continue
+                if x >= end:
+                    return
+                try:
+                    yield [x] + [int_or_float(v) for v in rec[1:]]
+                except ValueError:
+                    continue			# bad record ignored
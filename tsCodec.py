@@ -0,0 +1,123 @@
+"""
+Fast conversion between epoch seconds and the date strings of the csv Date column.
+
+datetime.strptime plus pytz localize costs tens of microseconds per record. Samples
+lie on a 5 minute or 1 hour grid, so almost every date shares its day, or its hour,
+with the previous one. TimestampCodec caches the UTC offset of each local day,
+and the formatted text of each hour, and computes the minutes and seconds within
+them arithmetically. Days containing a DST transition are cached per hour instead,
+with the offset that pytz localize(is_dst=False) chooses, so ambiguous fall-back
+times parse exactly as before.
+"""
+
+import calendar
+from datetime import datetime
+from typing import Iterable
+
+_C_DATE = datetime(2023, 7, 4, 5, 6, 7)		# probe of the locale's %c format
+_MONTHS = {calendar.month_abbr[i]: i for i in range(1, 13)}
+_WEEKDAYS = {calendar.day_abbr[i] for i in range(7)}
+_CACHE_MAX = 100000						# entries kept before a cache is cleared
+
+
+class TimestampCodec:
+    """Cached strptime/strftime of dates localized to a time zone
+
+    Parameters:
+        zone:			pytz time zone of the date strings
+        fmt (str):		format of the date strings
+    """
+
+    def __init__(self, zone, fmt: str = '%c'):
+        self.zone = zone
+        self.fmt = fmt
+        # fast parsing requires the C locale's "Tue Jul  4 05:06:07 2023"
+        self.c_locale = fmt == '%c' and _C_DATE.strftime(fmt) == 'Tue Jul  4 05:06:07 2023'
+        self.days = {}					# {(wday, mon, day, year): (midnight, offset)}
+        self.hours = {}					# {(wday, mon, day, year, hour): epoch seconds}
+        self.texts = {}					# {epoch hour: (prefix, suffix)}
+
+    def _localize(self, dt: datetime) -> float:
+        """Epoch seconds of naive local dt, as pytz resolves it"""
+        return self.zone.localize(dt).timestamp()
+
+    def _day(self, key: tuple) -> tuple:
+        """Midnight in naive epoch seconds, and UTC offset or None if DST changes"""
+        wday, mon, day, year = key
+        if wday not in _WEEKDAYS:
+            raise ValueError(f"unknown weekday {wday}")
+        d = datetime(int(year), _MONTHS[mon], int(day))  # ValueError if invalid
+        midnight = calendar.timegm(d.timetuple())
+        first = self.zone.localize(d).utcoffset()
+        last = self.zone.localize(d.replace(hour=23, minute=59)).utcoffset()
+        offset = first.total_seconds() if first == last else None
+        if len(self.days) >= _CACHE_MAX:
+            self.days.clear()
+        self.days[key] = result = (midnight, offset)
+        return result
+
+    def parse(self, date_str: str, fmt: str = None) -> float:
+        """Convert date-time string, localized to zone, to epoch seconds
+
+        :param date_str:    date-time string in zone
+        :param fmt:         format of date_str. Default=self.fmt
+        :return:            epoch seconds
+        """
+        if (fmt is None or fmt == self.fmt) and self.c_locale:
+            parts = date_str.split()
+            if len(parts) == 5 and parts[1] in _MONTHS:
+                hms = parts[3]
+                h, m, s = hms[0:2], hms[3:5], hms[6:8]
+                if len(hms) == 8 and hms[2] == hms[5] == ':' \
+                        and h.isdigit() and m.isdigit() and s.isdigit():
+                    h, m, s = int(h), int(m), int(s)
+                    if h < 24 and m < 60 and s < 60:
+                        key = (parts[0], parts[1], parts[2], parts[4])
+                        try:
+                            midnight, offset = self.days[key]
+                        except KeyError:
+                            midnight, offset = self._day(key)
+                        if offset is not None:	# no DST change this day
+                            return midnight + h*3600 + m*60 + s - offset
+                        key += (h,)
+                        try:
+                            hour = self.hours[key]
+                        except KeyError:
+                            if len(self.hours) >= _CACHE_MAX:
+                                self.hours.clear()
+                            d = datetime(int(key[3]), _MONTHS[key[1]], int(key[2]), h)
+                            hour = self.hours[key] = self._localize(d)
+                        return hour + m*60 + s
+        return self._localize(datetime.strptime(date_str, fmt or self.fmt))
+
+    def format(self, t: float, fmt: str = None) -> str:
+        """Convert float timestamp to date-time string localized to zone
+
+        :param t:       epoch seconds
+        :param fmt:     strftime format string. Default=self.fmt
+        :return:        t formatted as date-time string
+        """
+        if (fmt is None or fmt == self.fmt) and t == int(t):
+            hour, rem = divmod(int(t), 3600)
+            try:
+                text = self.texts[hour]
+            except KeyError:
+                s = datetime.fromtimestamp(hour*3600, self.zone).strftime(self.fmt)
+                text = tuple(s.split(':00:00')) if s.count(':00:00') == 1 else None
+                if len(self.texts) >= _CACHE_MAX:
+                    self.texts.clear()
+                self.texts[hour] = text
+            if text is not None:		# minutes and seconds are in the text?
+                m, s = divmod(rem, 60)
+                return f"{text[0]}:{m:02d}:{s:02d}{text[1]}"
+        return datetime.fromtimestamp(t, self.zone).strftime(fmt or self.fmt)
+
+    def parse_column(self, date_strs: Iterable[str], fmt: str = None) -> list:
+        """Convert a column of date-time strings to a list of epoch seconds"""
+        parse = self.parse
+        return [parse(s, fmt) for s in date_strs]
+
+    def format_column(self, times: Iterable[float], fmt: str = None) -> list:
+        """Convert a column of epoch seconds to a list of date-time strings"""
+        format_ = self.format
+        return [format_(t, fmt) for t in times]